@@ -42,7 +42,7 @@ binary representations of OSC-messages to a remote host:port address.
 
 The OSCServer listens on an 'AF_INET / SOCK_DGRAM' type socket bound to a local port, and handles
 incoming requests. Either one-after-the-other (OSCServer) or in a multi-threaded / multi-process fashion
-(ThreadingOSCServer / ForkingOSCServer). If the Server has a callback-function (a.k.a. handler) registered
+(ThreadingOSCServer / ForkingOSCServer), or by a fixed pool of worker-threads (PoolingOSCServer). If the Server has a callback-function (a.k.a. handler) registered
 to 'deal with' (i.e. handle) the received message's OSC-address, that function is called, passing it the (decoded) message
 
 The different OSCServers implemented here all support the (recursive) un-bundling of OSC-bundles,
@@ -133,12 +133,16 @@ Original Comments
 >     - dwh
 """
 
-import math, re, socket, select, string, struct, sys, threading, time, types
+import errno, heapq, math, re, socket, select, string, struct, sys, threading, time, types
 from SocketServer import UDPServer, DatagramRequestHandler, ForkingMixIn, ThreadingMixIn
+from collections import deque, OrderedDict
 
 global version
 version = ("0.3","5b", "$Rev: 5294 $"[6:-2])
 
+# flags for a send() that doesn't block, also on sockets shared with a (blocking) OSCServer
+_sendFlags = getattr(socket, 'MSG_DONTWAIT', 0)
+
 global FloatTypes
 FloatTypes = [types.FloatType]
 
@@ -562,7 +566,7 @@ class OSCBundle(OSCMessage):
             out = "#bundle ["
 
         if self.__len__():
-            for val in self.values():
+            for val in self._getChildren():
                 out += "%s, " % str(val)
             out = out[:-2]        # strip trailing space and comma
 
@@ -584,6 +588,42 @@ class OSCBundle(OSCMessage):
 
         return out
 
+    def clearData(self):
+        """Clear any OSCMessages appended so far
+        """
+        self._children = []
+        self._message = ""
+
+    def _getChildren(self):
+        """Returns the (internal) list of OSCMessages & OSCBundles in this bundle.
+        If the bundle's binary contents were set directly, they are decoded first.
+        """
+        if self._children == None:
+            self._children = []
+            for decoded in decodeOSC(OSCString("#bundle") + OSCTimeTag(0) + self._message)[2:]:
+                self._children.append(self._reencapsulate(decoded))
+
+        return self._children
+
+    def _getMessage(self):
+        if self._message == None:
+            self._message = "".join([OSCBlob(msg.getBinary()) for msg in self._children])
+
+        return self._message
+
+    def _setMessage(self, message):
+        self._message = message
+        self._children = None
+
+    # The binary contents are only built when needed (e.g. when sending), from the list
+    # of contained OSCMessages. Appending, iterating & copying don't need the binary.
+    message = property(_getMessage, _setMessage)
+
+    def _getTypeTags(self):
+        return "," + ('b' * len(self._getChildren()))
+
+    typetags = property(_getTypeTags)
+
     def append(self, argument, typehint = None):
         """Appends data to the bundle, creating an OSCMessage to encapsulate
         the provided argument unless this is already an OSCMessage.
@@ -594,7 +634,7 @@ class OSCBundle(OSCMessage):
           - if 'args' appears in the dict, its value(s) become the OSCMessage's arguments
         """
         if isinstance(argument, OSCMessage):
-            binary = OSCBlob(argument.getBinary())
+            msg = argument.copy()
         else:
             msg = OSCMessage(self.address)
             if type(argument) == types.DictType:
@@ -605,10 +645,8 @@ class OSCBundle(OSCMessage):
             else:
                 msg.append(argument, typehint)
 
-            binary = OSCBlob(msg.getBinary())
-
-        self.message += binary
-        self.typetags += 'b'
+        self._getChildren().append(msg)
+        self._message = None
 
     def getBinary(self):
         """Returns the binary representation of the message
@@ -635,13 +673,14 @@ class OSCBundle(OSCMessage):
         return msg
 
     def values(self):
-        """Returns a list of the OSCMessages appended so far
+        """Returns a list of (copies of) the OSCMessages appended so far
         """
-        out = []
-        for decoded in decodeOSC(self.getBinary())[2:]:
-            out.append(self._reencapsulate(decoded))
+        return [msg.copy() for msg in self._getChildren()]
 
-        return out
+    def __len__(self):
+        """Returns the number of OSCMessages appended so far
+        """
+        return len(self._getChildren())
 
     def __eq__(self, other):
         """Return True if two OSCBundles have the same timetag & content
@@ -649,13 +688,15 @@ class OSCBundle(OSCMessage):
         if not isinstance(other, self.__class__):
             return False
 
-        return (self.timetag == other.timetag) and (self.typetags == other.typetags) and (self.message == other.message)
+        return (self.timetag == other.timetag) and (self._getChildren() == other._getChildren())
 
     def copy(self):
         """Returns a deep copy of this OSCBundle
         """
-        copy = super(OSCBundle, self).copy()
-        copy.timetag = self.timetag
+        copy = self.__class__(self.address, self.timetag)
+        # the contained OSCMessages are never changed in place, so they can be shared.
+        copy._children = list(self._getChildren())
+        copy._message = self._message
         return copy
 
 ######
@@ -736,6 +777,177 @@ def OSCTimeTag(time):
 
     return binary
 
+######
+#
+# OSCEncoder class
+#
+######
+
+class OSCEncoder(object):
+    """Encodes OSC-messages & (nested) OSC-bundles into a single, reusable bytearray.
+    Arguments are written in place with struct.pack_into(), and the padded address &
+    typetag strings are cached per (address, typetags), so repeated messages don't
+    build any intermediate strings.
+      >>> enc = OSCEncoder()
+      >>> enc.beginBundle(time.time() + 1)
+      >>> enc.addMessage("/midi/noteon", [64, 80, 0], "iii")
+      >>> enc.endBundle()
+      >>> sock.send(enc.getView())
+    The buffer is overwritten after reset(), so send (or copy) its contents first.
+    """
+    _bundle_tag = OSCString("#bundle")
+
+    def __init__(self, size=4096):
+        """Instantiate an OSCEncoder with a buffer of 'size' bytes.
+        The buffer grows when needed.
+        """
+        self.buffer = bytearray(size)
+        self.size = 0
+        self._bundles = []
+        self._prefixes = {}
+
+    def __len__(self):
+        """Returns the number of bytes encoded so far
+        """
+        return self.size
+
+    def reset(self):
+        """Clear the encoded data (the buffer is kept)
+        """
+        self.size = 0
+        self._bundles = []
+
+    def truncate(self, size):
+        """Drop all data encoded after the first 'size' bytes,
+        including any bundles started there.
+        """
+        self.size = size
+        while self._bundles and self._bundles[-1][0] >= size:
+            self._bundles.pop()
+
+    def _reserve(self, num):
+        """Make sure 'num' more bytes fit in the buffer, and return the offset to write at.
+        """
+        offset = self.size
+        if offset + num > len(self.buffer):
+            self.buffer.extend(bytearray(max(offset + num, 2 * len(self.buffer)) - len(self.buffer)))
+
+        self.size = offset + num
+        return offset
+
+    def _writeString(self, data):
+        """Write (already padded) binary data at the end of the buffer
+        """
+        offset = self._reserve(len(data))
+        self.buffer[offset:offset + len(data)] = data
+
+    def _beginElement(self):
+        """Inside a bundle, reserve an int32 for the element size and return its offset
+        """
+        if self._bundles:
+            return self._reserve(4)
+
+        return None
+
+    def _endElement(self, offset):
+        """Write the size of the element that started at 'offset'
+        """
+        if offset != None:
+            struct.pack_into(">i", self.buffer, offset, self.size - offset - 4)
+
+    def _prefix(self, address, typetags):
+        """Returns the padded OSC-address & typetag strings, cached per (address, typetags)
+        """
+        key = (address, typetags)
+        try:
+            return self._prefixes[key]
+        except KeyError:
+            prefix = OSCString(address) + OSCString("," + typetags)
+            self._prefixes[key] = prefix
+            return prefix
+
+    def beginBundle(self, timetag=0):
+        """Start a new OSC-bundle. Messages & bundles added until the matching
+        endBundle() are part of this bundle.
+        """
+        start = self.size
+        element = self._beginElement()
+        self._bundles.append((start, element))
+        self._writeString(self._bundle_tag)
+
+        if timetag > 0:
+            fract, secs = math.modf(timetag)
+            struct.pack_into('>ll', self.buffer, self._reserve(8), long(secs), long(fract * 1e9))
+        else:
+            struct.pack_into('>ll', self.buffer, self._reserve(8), 0L, 1L)
+
+    def endBundle(self):
+        """End the OSC-bundle started last
+        """
+        (_, element) = self._bundles.pop()
+        self._endElement(element)
+
+    def endAllBundles(self):
+        """End all OSC-bundles that are still open
+        """
+        while self._bundles:
+            self.endBundle()
+
+    def addMessage(self, address, args, typetags=None):
+        """Encode an OSC-message with the given address & arguments.
+        'typetags' is a string with one 'i', 'f', 's' or 'b' per argument (without ',').
+        If omitted, typetags are derived from the argument types, as in OSCArgument().
+        """
+        if typetags == None:
+            typetags = ""
+            for arg in args:
+                if type(arg) in FloatTypes:
+                    typetags += 'f'
+                elif type(arg) in IntTypes:
+                    typetags += 'i'
+                else:
+                    typetags += 's'
+
+        element = self._beginElement()
+        self._writeString(self._prefix(address, typetags))
+
+        for (tag, arg) in zip(typetags, args):
+            if tag == 'i':
+                struct.pack_into(">i", self.buffer, self._reserve(4), int(arg))
+            elif tag == 'f':
+                struct.pack_into(">f", self.buffer, self._reserve(4), float(arg))
+            elif tag == 'b':
+                self._writeString(OSCBlob(arg))
+            else:
+                self._writeString(OSCString(arg))
+
+        self._endElement(element)
+
+    def addOSC(self, msg):
+        """Encode an existing OSCMessage or OSCBundle object
+        """
+        if isinstance(msg, OSCBundle):
+            self.beginBundle(msg.timetag)
+            for child in msg._getChildren():
+                self.addOSC(child)
+            self.endBundle()
+            return
+
+        element = self._beginElement()
+        self._writeString(self._prefix(msg.address, msg.typetags[1:]))
+        self._writeString(msg.message)
+        self._endElement(element)
+
+    def getView(self):
+        """Returns a memoryview of the encoded data (without copying)
+        """
+        return memoryview(self.buffer)[:self.size]
+
+    def getBinary(self):
+        """Returns a copy of the encoded data as a string
+        """
+        return str(self.buffer[:self.size])
+
 ######
 #
 # OSCMessage decoding functions
@@ -808,8 +1020,145 @@ def _readFloat(data):
 
     return (float, rest)
 
+_intStruct = struct.Struct(">i")
+_floatStruct = struct.Struct(">f")
+_timeTagStruct = struct.Struct(">ll")
+
+def _readStringAt(data, offset, end):
+    """Reads the (null-terminated) string starting at 'offset'
+    Returns (string, offset of next data)
+    An unterminated string reads like _readString() does: all but the last
+    byte, without moving the offset.
+    """
+    length = data.find("\0", offset, end) - offset
+    if length < 0:
+        return (data[offset:end-1], offset)
+
+    nextData = offset + ((length + 4) & ~3)
+    return (data[offset:offset+length], min(nextData, end))
+
+def _readBlobAt(data, offset, end):
+    """Reads the (numbered) block of data starting at 'offset'
+    Returns (blob, offset of next data)
+    Raises OSCError if the blob does not fit before 'end'
+    """
+    if (end - offset) < 4:
+        raise OSCError("too few bytes for blob-size")
+
+    length = _intStruct.unpack_from(data, offset)[0]
+    if (length < 0) or (offset + 4 + length > end):
+        raise OSCError("truncated blob; %d bytes of %d" % (max(end - offset - 4, 0), length))
+
+    nextData = offset + ((length + 3) & ~3) + 4
+    return (data[offset+4:offset+4+length], min(nextData, end))
+
+def _readIntAt(data, offset, end):
+    """Interprets the 4 bytes at 'offset' as a 32-bit integer.
+    Returns (integer, offset of next data)
+    """
+    if (end - offset) < 4:
+        print "Error: too few bytes for int", data[offset:end], end - offset
+        return (0, offset)
+
+    return (_intStruct.unpack_from(data, offset)[0], offset + 4)
+
+def _readFloatAt(data, offset, end):
+    """Interprets the 4 bytes at 'offset' as a 32-bit float.
+    Returns (float, offset of next data)
+    """
+    if (end - offset) < 4:
+        print "Error: too few bytes for float", data[offset:end], end - offset
+        return (0, offset)
+
+    return (_floatStruct.unpack_from(data, offset)[0], offset + 4)
+
+def _readTimeTagAt(data, offset, end):
+    """Interprets the 8 bytes at 'offset' as a TimeTag.
+    Returns (time, offset of next data)
+    Raises OSCError if the time-tag does not fit before 'end'
+    """
+    if (end - offset) < 8:
+        raise OSCError("too few bytes for time-tag")
+
+    high, low = _timeTagStruct.unpack_from(data, offset)
+    if (high == 0) and (low <= 1):
+        time = 0.0
+    else:
+        time = int(high) + float(low / 1e9)
+
+    return (time, offset + 8)
+
+_readTableAt = {"i":_readIntAt, "f":_readFloatAt, "s":_readStringAt, "b":_readBlobAt}
+
+def _decodeAt(data, offset, end):
+    """Decodes the OSC-packet in data[offset:end], moving an offset
+    instead of slicing off the remaining data after each field.
+    Ints, floats & strings are read inline; other typetags (and
+    truncated packets) go through _readTableAt.
+    """
+    decoded = []
+    address, offset = _readStringAt(data, offset, end)
+    if address.startswith(","):
+        typetags = address
+        address = ""
+    else:
+        typetags = ""
+
+    if address == "#bundle":
+        time, offset = _readTimeTagAt(data, offset, end)
+        decoded.append(address)
+        decoded.append(time)
+        while (end - offset) >= 4:
+            length = _intStruct.unpack_from(data, offset)[0]
+            offset += 4
+            if length < 0:
+                # Sliced like the remaining data: all but the last -length bytes
+                length = max(end - offset + length, 0)
+
+            decoded.append(_decodeAt(data, offset, min(offset + length, end)))
+            offset += length
+
+    elif offset < end:
+        if not len(typetags):
+            typetags, offset = _readStringAt(data, offset, end)
+        decoded.append(address)
+        decoded.append(typetags)
+        if typetags.startswith(","):
+            append = decoded.append
+            for tag in typetags[1:]:
+                if tag == "i" and (end - offset) >= 4:
+                    append(_intStruct.unpack_from(data, offset)[0])
+                    offset += 4
+                elif tag == "f" and (end - offset) >= 4:
+                    append(_floatStruct.unpack_from(data, offset)[0])
+                    offset += 4
+                elif tag == "s" and data.find("\0", offset, end) >= 0:
+                    length = data.find("\0", offset, end) - offset
+                    append(data[offset:offset+length])
+                    offset = min(offset + ((length + 4) & ~3), end)
+                else:
+                    value, offset = _readTableAt[tag](data, offset, end)
+                    append(value)
+        else:
+            raise OSCError("OSCMessage's typetag-string lacks the magic ','")
+
+    return decoded
+
 def decodeOSC(data):
     """Converts a binary OSC message to a Python list.
+    'data' is a string, or a buffer (bytearray / memoryview) holding the packet.
+    """
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    elif isinstance(data, bytearray):
+        data = str(data)
+
+    return _decodeAt(data, 0, len(data))
+
+def _decodeOSCSlicing(data):
+    """Converts a binary OSC message to a Python list, slicing off the
+    remaining data after each field. This was decodeOSC() before the
+    offset-based decoder; it's kept for benchmarkDecode().
     """
     table = {"i":_readInt, "f":_readFloat, "s":_readString, "b":_readBlob}
     decoded = []
@@ -826,7 +1175,7 @@ def decodeOSC(data):
         decoded.append(time)
         while len(rest)>0:
             length, rest = _readInt(rest)
-            decoded.append(decodeOSC(rest[:length]))
+            decoded.append(_decodeOSCSlicing(rest[:length]))
             rest = rest[length:]
 
     elif len(rest)>0:
@@ -867,6 +1216,37 @@ def hexDump(bytes):
     if bytes_left:
         print "%s: %s" % (line.ljust(54), repr(bytes[-bytes_left:]))
 
+def benchmarkDecode(depth=3, width=4, number=1000):
+    """Times decodeOSC() against the slicing decoder it replaced, on a
+    bundle nested 'depth' levels deep with 'width' elements per level
+    (each level holds (width - 1) note-like messages and one sub-bundle).
+    Prints & returns the number of packets decoded per second by both.
+    """
+    def nested(level):
+        bundle = OSCBundle("/midi/noteon", time.time() + level)
+        for i in range(width - 1):
+            bundle.append([60 + i, 80, level, "C5", 1.5])
+        if level < depth:
+            bundle.append(nested(level + 1))
+        return bundle
+
+    binary = nested(1).getBinary()
+    if decodeOSC(binary) != _decodeOSCSlicing(binary):
+        raise OSCError("decodeOSC() and the slicing decoder disagree")
+
+    rates = []
+    for decoder in (_decodeOSCSlicing, decodeOSC):
+        start = time.time()
+        for i in xrange(number):
+            decoder(binary)
+        rates.append(number / (time.time() - start))
+
+    print "%d bytes, depth %d, width %d" % (len(binary), depth, width)
+    print "slicing decoder: %10.0f packets/s" % rates[0]
+    print "decodeOSC:       %10.0f packets/s (%.2fx)" % (rates[1], rates[1] / rates[0])
+
+    return tuple(rates)
+
 def getUrlStr(*args):
     """Convert provided arguments to a string in 'host:port/prefix' format
     Args can be:
@@ -974,6 +1354,9 @@ class OSCClient(object):
     # set outgoing socket buffer size
     sndbuf_size = 4096 * 8
 
+    # maximum number of connected sockets kept for sendto() destinations
+    sendto_pool_size = 8
+
     def __init__(self, server=None):
         """Construct an OSC Client.
         When the 'address' argument is given this client is connected to a specific remote server.
@@ -985,10 +1368,13 @@ class OSCClient(object):
           If none is supplied, a socket will be created.
         """
         self.socket = None
+        self._pool = OrderedDict()
+        self._poolLock = threading.Lock()
 
         if server == None:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
             self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.sndbuf_size)
+            self.socket.setblocking(0)
             self._fd = self.socket.fileno()
 
             self.server = None
@@ -1008,6 +1394,8 @@ class OSCClient(object):
         if self.socket != None:
             self.close()
 
+        # the duplicate shares the Server's socket (and its timeout), so it is left blocking;
+        # _sendOn() sends with MSG_DONTWAIT instead.
         self.socket = server.socket.dup()
         self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.sndbuf_size)
         self._fd = self.socket.fileno()
@@ -1020,12 +1408,20 @@ class OSCClient(object):
         self.server.client = self
 
     def close(self):
-        """Disconnect & close the Client's socket
+        """Disconnect & close the Client's socket, and the sockets kept for sendto()
         """
         if self.socket != None:
             self.socket.close()
             self.socket = None
 
+        self._poolLock.acquire()
+        try:
+            for entry in self._pool.values():
+                self._evictSocket(entry)
+            self._pool = OrderedDict()
+        finally:
+            self._poolLock.release()
+
     def __str__(self):
         """Returns a string containing this Client's Class-name, software-version
         and the remote-address it is connected to (if any)
@@ -1089,23 +1485,35 @@ class OSCClient(object):
           - timeout:  A timeout value for attempting to send. If timeout == None,
               this call blocks until socket is available for writing.
         Raises OSCClientError when timing out while waiting for the socket.
+        Unless this Client uses a Server's socket, messages to addresses other than the one
+        this Client is connected to are sent from a pool of sockets connected to those addresses.
         """
         if not isinstance(msg, OSCMessage):
             raise TypeError("'msg' argument is not an OSCMessage or OSCBundle object")
 
-        ret = select.select([],[self._fd], [], timeout)
-        try:
-            ret[1].index(self._fd)
-        except:
-            # for the very rare case this might happen
-            raise OSCClientError("Timed out waiting for file descriptor")
+        binary = msg.getBinary()
 
         try:
-            self.socket.connect(address)
-            self.socket.sendall(msg.getBinary())
+            if address == self.client_address:
+                self._sendOn(self.socket, binary, timeout)
+
+            elif self.server == None:
+                entry = self._leaseSocket(address)
+                try:
+                    self._sendOn(entry[0], binary, timeout)
+                finally:
+                    self._releaseSocket(entry)
 
-            if self.client_address:
-                self.socket.connect(self.client_address)
+            elif self.client_address == None:
+                # replies must come from the server's socket
+                self._sendOn(self.socket, binary, timeout, address)
+
+            else:
+                self.socket.connect(address)
+                try:
+                    self._sendOn(self.socket, binary, timeout)
+                finally:
+                    self.socket.connect(self.client_address)
 
         except socket.error, e:
             if e[0] in (7, 65):    # 7 = 'no address associated with nodename',  65 = 'no route to host'
@@ -1125,21 +1533,89 @@ class OSCClient(object):
         if not isinstance(msg, OSCMessage):
             raise TypeError("'msg' argument is not an OSCMessage or OSCBundle object")
 
-        ret = select.select([],[self._fd], [], timeout)
-        try:
-            ret[1].index(self._fd)
-        except:
-            # for the very rare case this might happen
-            raise OSCClientError("Timed out waiting for file descriptor")
+        self.sendBinary(msg.getBinary(), timeout)
 
+    def sendBinary(self, binary, timeout=None):
+        """Send already encoded OSC-data (a string, or a buffer such as
+        OSCEncoder.getView()) without copying it.
+        The Client must be already connected.
+        """
         try:
-            self.socket.sendall(msg.getBinary())
+            self._sendOn(self.socket, binary, timeout)
         except socket.error, e:
             if e[0] in (7, 65):    # 7 = 'no address associated with nodename',  65 = 'no route to host'
                 raise e
             else:
                 raise OSCClientError("while sending: %s" % str(e))
 
+    def _sendOn(self, sock, binary, timeout, address=None):
+        """Send a datagram on the given socket without blocking; to 'address', if given.
+        Only when the socket's buffer is full (EAGAIN), waits for the socket
+        to become writable, at most 'timeout' seconds if timeout != None.
+        """
+        while True:
+            try:
+                if address == None:
+                    return sock.send(binary, _sendFlags)
+                else:
+                    return sock.sendto(binary, _sendFlags, address)
+            except socket.error, e:
+                if e[0] not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    raise
+
+            ret = select.select([], [sock], [], timeout)
+            if not len(ret[1]):
+                raise OSCClientError("Timed out waiting for file descriptor")
+
+    def _leaseSocket(self, address):
+        """Returns the pool-entry [socket, users, pooled] of a socket connected to the given address,
+        for sendto(). The socket is in use until the entry is passed to _releaseSocket().
+        The last 'sendto_pool_size' used sockets are kept open.
+        """
+        self._poolLock.acquire()
+        try:
+            entry = self._pool.pop(address, None)
+            if entry == None:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.sndbuf_size)
+                sock.setblocking(0)
+                try:
+                    sock.connect(address)
+                except socket.error:
+                    sock.close()
+                    raise
+
+                entry = [sock, 0, True]
+
+            self._pool[address] = entry
+            entry[1] += 1
+            while len(self._pool) > self.sendto_pool_size:
+                self._evictSocket(self._pool.popitem(last=False)[1])
+
+            return entry
+        finally:
+            self._poolLock.release()
+
+    def _releaseSocket(self, entry):
+        """Ends a send on a socket leased by _leaseSocket().
+        Closes the socket if it was evicted from the pool meanwhile.
+        """
+        self._poolLock.acquire()
+        try:
+            entry[1] -= 1
+            if not (entry[1] or entry[2]):
+                entry[0].close()
+        finally:
+            self._poolLock.release()
+
+    def _evictSocket(self, entry):
+        """Removes a pool-entry; its socket is closed now, or when the last send using it ends.
+        Call with '_poolLock' held.
+        """
+        entry[2] = False
+        if not entry[1]:
+            entry[0].close()
+
 ######
 #
 # FilterString Utility functions
@@ -1231,6 +1707,188 @@ def getRegEx(pattern):
 
     return re.compile(pattern)
 
+def getSegmentRegEx(pattern):
+    """Compiles and returns a 'regular expression' object for the given address-pattern,
+    which only matches the whole address (not just the start of it).
+    """
+    return re.compile("(?:%s)\Z" % getRegEx(pattern).pattern)
+
+######
+#
+# OSCAddressSpace class
+#
+######
+
+class OSCAddressSpace(dict):
+    """Dict of OSC-address -> callback, indexed for dispatching address-patterns.
+    Literal address-patterns are looked up directly in the dict.
+    Address-patterns with wildcards are matched segment-by-segment against a trie
+    of the registered addresses' segments. Segments containing '*', '?' or '[',
+    which may match more than one address-segment, are matched as a regular
+    expression against the addresses below the trie-node reached so far.
+    Matching addresses are kept for the last 'cache_size' wildcard-patterns;
+    this cache is cleared whenever an address is added or removed.
+    """
+    # characters that make an address-pattern a wildcard-pattern
+    _wildcards = re.compile(r"[*?,\[\]{}]")
+
+    # characters that make an address-segment match across segments
+    _multiSegment = re.compile(r"[*?\[]")
+
+    def __init__(self, callbacks={}, cache_size=256):
+        """Instantiate an OSCAddressSpace.
+          - callbacks (dict): initial OSC-address -> callback mapping
+          - cache_size (int): number of wildcard-patterns to keep matches for
+        """
+        dict.__init__(self)
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._trie = {}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.update(callbacks)
+
+    def __setitem__(self, address, callback):
+        if address not in self:
+            node = self._trie
+            for segment in address.split('/'):
+                node = node.setdefault(segment, {})
+            node[None] = address
+            self.clearCache()
+
+        dict.__setitem__(self, address, callback)
+
+    def __delitem__(self, address):
+        dict.__delitem__(self, address)
+
+        path = [self._trie]
+        for segment in address.split('/'):
+            path.append(path[-1][segment])
+        del path[-1][None]
+
+        # prune empty trie-nodes
+        for (node, segment) in reversed(zip(path[:-1], address.split('/'))):
+            if len(node[segment]):
+                break
+            del node[segment]
+
+        self.clearCache()
+
+    def update(self, *args, **kwargs):
+        for (address, callback) in dict(*args, **kwargs).items():
+            self[address] = callback
+
+    def setdefault(self, address, callback=None):
+        if address not in self:
+            self[address] = callback
+        return self[address]
+
+    def pop(self, address, *default):
+        if address not in self:
+            return dict.pop(self, address, *default)
+        callback = self[address]
+        del self[address]
+        return callback
+
+    def popitem(self):
+        (address, callback) = dict.popitem(self)
+        dict.__setitem__(self, address, callback)
+        del self[address]
+        return (address, callback)
+
+    def clear(self):
+        dict.clear(self)
+        self._trie = {}
+        self.clearCache()
+
+    def clearCache(self):
+        """Forget the matches of all cached wildcard-patterns
+        """
+        self._lock.acquire()
+        try:
+            self._cache = OrderedDict()
+        finally:
+            self._lock.release()
+
+    def match(self, pattern):
+        """Returns a tuple of the registered OSC-addresses matching the given address-pattern
+        """
+        if pattern in self:
+            return (pattern,)
+
+        if not self._wildcards.search(pattern):
+            return ()
+
+        self._lock.acquire()
+        try:
+            matches = self._cache.pop(pattern, None)
+            if matches != None:
+                self.hits += 1
+                self._cache[pattern] = matches
+                return matches
+        finally:
+            self._lock.release()
+
+        matches = tuple(self._matchTrie(pattern))
+
+        self._lock.acquire()
+        try:
+            self.misses += 1
+            self._cache.pop(pattern, None)
+            self._cache[pattern] = matches
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        finally:
+            self._lock.release()
+
+        return matches
+
+    def _matchTrie(self, pattern):
+        """Walks the trie along the segments of the given address-pattern
+        """
+        segments = pattern.split('/')
+        nodes = [self._trie]
+        for segment in segments:
+            if self._multiSegment.search(segment) or (segment.count('{') != segment.count('}')):
+                # match the rest of the pattern against all addresses below these nodes
+                expr = getSegmentRegEx(pattern)
+                matches = []
+                for node in nodes:
+                    for address in self._addresses(node):
+                        if expr.match(address):
+                            matches.append(address)
+                return matches
+
+            if self._wildcards.search(segment):
+                expr = getSegmentRegEx(segment)
+                nodes = [child for node in nodes
+                               for (key, child) in node.items()
+                               if (key != None) and expr.match(key)]
+            else:
+                nodes = [node[segment] for node in nodes if segment in node]
+
+            if not len(nodes):
+                return []
+
+        return [node[None] for node in nodes if None in node]
+
+    def _addresses(self, node):
+        """Returns all addresses registered below the given trie-node
+        """
+        out = []
+        stack = [node]
+        while len(stack):
+            node = stack.pop()
+            for (key, child) in node.items():
+                if key == None:
+                    out.append(child)
+                else:
+                    stack.append(child)
+
+        return out
+
 ######
 #
 # OSCMultiClient class
@@ -1252,6 +1910,11 @@ class OSCMultiClient(OSCClient):
 
         self.targets = {}
 
+        # per OSCTarget: (prefix, copy of filters, (prefix, compiled filters))
+        self._targetCache = {}
+        # per compiled filters: {OSC-address:bool}
+        self._filterDecisions = {}
+
     def _searchHostAddr(self, host):
         """Search the subscribed OSCTargets for (the first occurence of) given host.
         Returns a (host, port) tuple
@@ -1352,6 +2015,9 @@ class OSCMultiClient(OSCClient):
         except KeyError:
             raise NotSubscribedError(address, prefix)
 
+        if address not in self.targets:
+            self._targetCache.pop(address, None)
+
     def delOSCTarget(self, address, prefix=None):
         """Delete the specified OSCTarget from the Client's dict.
         the 'address' argument can be a ((host, port) tuple), or a hostname.
@@ -1438,6 +2104,7 @@ class OSCMultiClient(OSCClient):
         """Erases all OSCTargets from the Client's dict
         """
         self.targets = {}
+        self._targetCache = {}
 
     def updateOSCTargets(self, dict):
         """Update the Client's OSCTargets dict with the contents of 'dict'
@@ -1493,54 +2160,90 @@ class OSCMultiClient(OSCClient):
         """
         self.send(msg, timeout)
 
+    def _compileFilters(self, filters):
+        """Compiles a 'filters' dict into a (default, ((addr, bool), ...)) tuple.
+        'default' is the outcome for OSC-addresses that don't match any filter.
+        Returns None if there are no filters.
+        """
+        if not len(filters):
+            return None
+
+        if '/*' in filters.keys():
+            default = filters['/*']
+        else:
+            default = (False in filters.values())
+
+        return (default, tuple([(addr, bool) for (addr, bool) in filters.items() if addr != '/*']))
+
+    def _targetGroup(self, address, prefix, filters):
+        """Returns the (prefix, compiled filters) of the given OSCTarget.
+        OSCTargets in the same group receive the same binary data.
+        The compiled filters are cached until the OSCTarget's prefix or filters change.
+        """
+        cached = self._targetCache.get(address)
+        if (cached == None) or (cached[0] != prefix) or (cached[1] != filters):
+            cached = (prefix, dict(filters), (prefix, self._compileFilters(filters)))
+            self._targetCache[address] = cached
+
+        return cached[2]
+
+    def _filterAddress(self, compiled, address):
+        """Returns True if an OSCMessage with the given OSC-address passes the compiled filters.
+        The decision is memoized per compiled filters & OSC-address.
+        """
+        decisions = self._filterDecisions.get(compiled)
+        if decisions == None:
+            decisions = self._filterDecisions[compiled] = {}
+        elif address in decisions:
+            return decisions[address]
+
+        (out, items) = compiled
+        expr = getRegEx(address)
+        for (addr, bool) in items:
+            match = expr.match(addr)
+            if match and (match.end() == len(addr)):
+                out = bool
+                break
+
+        if len(decisions) >= 1024:
+            decisions.clear()
+        decisions[address] = out
+
+        return out
+
     def _filterMessage(self, filters, msg):
         """Checks the given OSCMessge against the given filters.
-        'filters' is a dict containing OSC-address:bool pairs.
+        'filters' is a dict containing OSC-address:bool pairs, or the compiled filters.
         If 'msg' is an OSCBundle, recursively filters its constituents.
         Returns None if the message is to be filtered, else returns the message.
         or
         Returns a copy of the OSCBundle with the filtered messages removed.
         """
+        if type(filters) == types.DictType:
+            filters = self._compileFilters(filters)
+            if filters == None:
+                return msg
+
         if isinstance(msg, OSCBundle):
             out = msg.copy()
             msgs = out.values()
             out.clearData()
             for m in msgs:
                 m = self._filterMessage(filters, m)
-                if m:        # this catches 'None' and empty bundles.
+                if (m != None) and not (isinstance(m, OSCBundle) and not len(m)):    # this catches 'None' and empty bundles.
                     out.append(m)
 
+            return out
+
         elif isinstance(msg, OSCMessage):
-            if '/*' in filters.keys():
-                if filters['/*']:
-                    out = msg
-                else:
-                    out = None
+            if self._filterAddress(filters, msg.address):
+                return msg
 
-            elif False in filters.values():
-                out = msg
-            else:
-                out = None
+            return None
 
         else:
             raise TypeError("'msg' argument is not an OSCMessage or OSCBundle object")
 
-        expr = getRegEx(msg.address)
-
-        for addr in filters.keys():
-            if addr == '/*':
-                continue
-
-            match = expr.match(addr)
-            if match and (match.end() == len(addr)):
-                if filters[addr]:
-                    out = msg
-                else:
-                    out = None
-                break
-
-        return out
-
     def _prefixAddress(self, prefix, msg):
         """Makes a copy of the given OSCMessage, then prepends the given prefix to
         The message's OSC-address.
@@ -1562,37 +2265,63 @@ class OSCMultiClient(OSCClient):
 
         return out
 
+    def _encodeGroup(self, group, msg, binaries):
+        """Returns the binary data to send to the OSCTargets in the given group,
+        or None if the message is filtered out.
+        'binaries' holds the encodings already made for other groups; groups with
+        the same prefix share the encoding of messages that pass their filters.
+        """
+        (prefix, filters) = group
+        if filters != None:
+            out = self._filterMessage(filters, msg)
+            if (out == None) or (isinstance(out, OSCBundle) and not len(out)):
+                return None
+
+            if out is not msg:
+                if len(prefix):
+                    out = self._prefixAddress(prefix, out)
+                return out.getBinary()
+
+            # passed unchanged; share the unfiltered encoding.
+            group = (prefix, None)
+            if group in binaries:
+                return binaries[group]
+
+        if not len(prefix):
+            binary = msg.getBinary()
+        elif isinstance(msg, OSCBundle):
+            binary = self._prefixAddress(prefix, msg).getBinary()
+        else:
+            binary = OSCString(prefix + msg.address) + OSCString(msg.typetags) + msg.message
+
+        binaries[group] = binary
+
+        return binary
+
     def send(self, msg, timeout=None):
         """Send the given OSCMessage to all subscribed OSCTargets
+        The message is encoded once for all OSCTargets with the same prefix & filters.
           - msg:  OSCMessage (or OSCBundle) to be sent
           - timeout:  A timeout value for attempting to send. If timeout == None,
               this call blocks until socket is available for writing.
         Raises OSCClientError when timing out while waiting for    the socket.
         """
+        if not isinstance(msg, OSCMessage):
+            raise TypeError("'msg' argument is not an OSCMessage or OSCBundle object")
+
+        binaries = {}
         for (address, (prefix, filters)) in self.targets.items():
-            if len(filters):
-                out = self._filterMessage(filters, msg)
-                if not out:            # this catches 'None' and empty bundles.
-                    continue
+            group = self._targetGroup(address, prefix, filters)
+            if group in binaries:
+                binary = binaries[group]
             else:
-                out = msg
-
-            if len(prefix):
-                out = self._prefixAddress(prefix, msg)
-
-            binary = out.getBinary()
+                binary = binaries[group] = self._encodeGroup(group, msg, binaries)
 
-            ret = select.select([],[self._fd], [], timeout)
-            try:
-                ret[1].index(self._fd)
-            except:
-                # for the very rare case this might happen
-                raise OSCClientError("Timed out waiting for file descriptor")
+            if binary == None:
+                continue
 
             try:
-                while len(binary):
-                    sent = self.socket.sendto(binary, address)
-                    binary = binary[sent:]
+                self._sendOn(self.socket, binary, timeout, address)
 
             except socket.error, e:
                 if e[0] in (7, 65):    # 7 = 'no address associated with nodename',  65 = 'no route to host'
@@ -1620,42 +2349,15 @@ class OSCRequestHandler(DatagramRequestHandler):
           - tags (string):  The OSC-typetags of the receied message's arguments, without ','
           - data (list):  The message arguments
         """
-        if len(tags) != len(data):
-            raise OSCServerError("Malformed OSC-message; got %d typetags [%s] vs. %d values" % (len(tags), tags, len(data)))
+        return self.server.dispatchMessage(pattern, tags, data, self.client_address)
 
-        expr = getRegEx(pattern)
-
-        replies = []
-        matched = 0
-        for addr in self.server.callbacks.keys():
-            match = expr.match(addr)
-            if match and (match.end() == len(addr)):
-                reply = self.server.callbacks[addr](pattern, tags, data, self.client_address)
-                matched += 1
-                if isinstance(reply, OSCMessage):
-                    replies.append(reply)
-                elif reply != None:
-                    raise TypeError("Message-callback %s did not return OSCMessage or None: %s" % (self.server.callbacks[addr], type(reply)))
-
-        if matched == 0:
-            if 'default' in self.server.callbacks:
-                reply = self.server.callbacks['default'](pattern, tags, data, self.client_address)
-                if isinstance(reply, OSCMessage):
-                    replies.append(reply)
-                elif reply != None:
-                    raise TypeError("Message-callback %s did not return OSCMessage or None: %s" % (self.server.callbacks['default'], type(reply)))
-            else:
-                raise NoCallbackError(pattern)
-
-        return replies
-
-    def setup(self):
-        """Prepare RequestHandler.
-        Unpacks request as (packet, source socket address)
-        Creates an empty list for replies.
-        """
-        (self.packet, self.socket) = self.request
-        self.replies = []
+    def setup(self):
+        """Prepare RequestHandler.
+        Unpacks request as (packet, source socket address)
+        Creates an empty list for replies.
+        """
+        (self.packet, self.socket) = self.request
+        self.replies = []
 
     def _unbundle(self, decoded):
         """Recursive bundle-unpacking function"""
@@ -1666,6 +2368,10 @@ class OSCRequestHandler(DatagramRequestHandler):
         now = time.time()
         timetag = decoded[1]
         if (timetag > 0.) and (timetag > now):
+            if self.server.timetag_scheduling:
+                self.server.scheduleBundle(decoded, self.client_address)
+                return
+
             time.sleep(timetag - now)
 
         for msg in decoded[2:]:
@@ -1685,19 +2391,7 @@ class OSCRequestHandler(DatagramRequestHandler):
         Send any reply returned by the callback(s) back to the originating client
         as an OSCMessage or OSCBundle
         """
-        if self.server.return_port:
-            self.client_address = (self.client_address[0], self.server.return_port)
-
-        if len(self.replies) > 1:
-            msg = OSCBundle()
-            for reply in self.replies:
-                msg.append(reply)
-        elif len(self.replies) == 1:
-            msg = self.replies[0]
-        else:
-            return
-
-        self.server.client.sendto(msg, self.client_address)
+        self.server.sendReplies(self.replies, self.client_address)
 
 class ThreadingOSCRequestHandler(OSCRequestHandler):
     """Multi-threaded OSCRequestHandler;
@@ -1715,6 +2409,10 @@ class ThreadingOSCRequestHandler(OSCRequestHandler):
         now = time.time()
         timetag = decoded[1]
         if (timetag > 0.) and (timetag > now):
+            if self.server.timetag_scheduling:
+                self.server.scheduleBundle(decoded, self.client_address)
+                return
+
             time.sleep(timetag - now)
             now = time.time()
 
@@ -1729,13 +2427,327 @@ class ThreadingOSCRequestHandler(OSCRequestHandler):
         for t in children:
             t.join()
 
+######
+#
+# OSCTimetagScheduler class
+#
+######
+
+class OSCTimetagScheduler(threading.Thread):
+    """Holds OSC-bundles until their timetag, in a single thread.
+    Bundles are kept in a heap, ordered by timetag. The thread sleeps until
+    the first bundle is due (or a new bundle arrives), then calls the callback.
+    The thread sleeps in select() on a pair of local sockets, and is woken up by
+    a datagram when a bundle is due earlier; in Python 2 a timed Condition.wait()
+    polls, and would notice that up to 50 ms late.
+    """
+    def __init__(self, callback):
+        """Instantiate an OSCTimetagScheduler.
+          - callback: function called with (decoded, client_address) of each
+          held bundle, at the bundle's timetag.
+        """
+        threading.Thread.__init__(self, name="OSCTimetagScheduler")
+        self.daemon = True
+
+        self.callback = callback
+        self.running = True
+        self._queue = []
+        self._count = 0
+        self._lock = threading.Lock()
+
+        self._wakeIn = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._wakeIn.bind(('127.0.0.1', 0))
+        self._wakeOut = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._wakeOut.connect(self._wakeIn.getsockname())
+        self._wakeIn.connect(self._wakeOut.getsockname())
+        self._wakeIn.setblocking(0)
+
+    def __len__(self):
+        """Returns the number of bundles held
+        """
+        return len(self._queue)
+
+    def schedule(self, decoded, client_address):
+        """Hold the given (decoded) bundle until its timetag.
+        """
+        self._lock.acquire()
+        try:
+            entry = (decoded[1], self._count, decoded, client_address)
+            heapq.heappush(self._queue, entry)
+            self._count += 1
+            first = (self._queue[0] is entry)
+        finally:
+            self._lock.release()
+
+        # the thread sleeps until the old first bundle; wake it up
+        if first:
+            self._wake()
+
+    def run(self):
+        """Call the callback for each bundle that is due, until stopped.
+        """
+        try:
+            while self.running:
+                self._lock.acquire()
+                try:
+                    due = []
+                    now = time.time()
+                    while self._queue and (self._queue[0][0] <= now):
+                        due.append(heapq.heappop(self._queue))
+
+                    timeout = None
+                    if self._queue:
+                        timeout = self._queue[0][0] - now
+                finally:
+                    self._lock.release()
+
+                if not due:
+                    self._sleep(timeout)
+                    continue
+
+                for (_, _, decoded, client_address) in due:
+                    self.callback(decoded, client_address)
+        finally:
+            self._wakeIn.close()
+            self._wakeOut.close()
+
+    def stop(self):
+        """Stop the scheduler thread. Held bundles are dropped.
+        Bundles being dispatched are finished; join() the thread to wait for that.
+        """
+        self._lock.acquire()
+        try:
+            self.running = False
+            self._queue = []
+        finally:
+            self._lock.release()
+
+        self._wake()
+
+    def _sleep(self, timeout):
+        """Wait until woken up by _wake(), at most 'timeout' seconds if timeout != None
+        """
+        try:
+            select.select([self._wakeIn], [], [], timeout)
+        except select.error, e:
+            if e[0] != errno.EINTR:
+                raise
+
+        try:
+            while True:
+                self._wakeIn.recv(64)
+        except socket.error:
+            pass
+
+    def _wake(self):
+        """Wake up the scheduler thread
+        """
+        try:
+            self._wakeOut.send('\0')
+        except socket.error:
+            # already stopped (socket closed), or the wake-up is pending anyway (buffer full)
+            pass
+
+######
+#
+# OSCWorkerPool class
+#
+######
+
+class OSCWorkerPool(object):
+    """A fixed number of worker-threads, each with its own bounded job-queue.
+    Jobs are submitted with a key (e.g. an OSC-address). All jobs with the same key
+    go to the same worker, so they are run in the order they were submitted.
+    When a worker's queue is full, the overflow-policy decides what happens:
+      - 'drop_oldest': the oldest queued job is dropped to make room for the new one
+      - 'block': submit() waits until the worker has made room
+      - 'reject': the new job is refused; submit() raises OSCServerError
+    """
+    overflow_policies = ('drop_oldest', 'block', 'reject')
+
+    def __init__(self, workers=4, queue_size=256, overflow='drop_oldest'):
+        """Instantiate an OSCWorkerPool.
+          - workers (int): the number of worker-threads
+          - queue_size (int): the maximum number of queued jobs per worker
+          - overflow (string): the overflow-policy; one of 'drop_oldest', 'block' or 'reject'
+        """
+        if overflow not in self.overflow_policies:
+            raise ValueError("'overflow' must be one of %s, not %s" % (str(self.overflow_policies), repr(overflow)))
+
+        if (workers < 1) or (queue_size < 1):
+            raise ValueError("'workers' and 'queue_size' must be at least 1")
+
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.running = False
+
+        # number of jobs dropped & rejected because a queue was full
+        self.dropped = 0
+        self.rejected = 0
+
+        self._queues = [deque() for i in range(workers)]
+        self._conds = [threading.Condition() for i in range(workers)]
+        self._threads = []
+        for i in range(workers):
+            t = threading.Thread(target=self._work, args=(i,), name="OSCWorker-%d" % i)
+            t.daemon = True
+            self._threads.append(t)
+
+    def __len__(self):
+        """Returns the number of queued jobs
+        """
+        return sum([len(queue) for queue in self._queues])
+
+    def start(self):
+        """Start the worker-threads
+        """
+        self.running = True
+        for t in self._threads:
+            t.start()
+
+    def stop(self):
+        """Stop the worker-threads. Queued jobs are dropped,
+        jobs being run are finished before this returns.
+        """
+        self.running = False
+        for (queue, cond) in zip(self._queues, self._conds):
+            cond.acquire()
+            try:
+                queue.clear()
+                cond.notifyAll()
+            finally:
+                cond.release()
+
+        for t in self._threads:
+            if t.isAlive() and (t != threading.currentThread()):
+                t.join()
+
+    def submit(self, key, func, *args):
+        """Queue a call of func(*args) with the worker for the given key
+        """
+        i = hash(key) % len(self._queues)
+        queue = self._queues[i]
+        cond = self._conds[i]
+
+        cond.acquire()
+        try:
+            while len(queue) >= self.queue_size:
+                if self.overflow == 'drop_oldest':
+                    queue.popleft()
+                    self.dropped += 1
+                elif self.overflow == 'block':
+                    # untimed; in Python 2 a timed wait() polls, waking up late
+                    cond.wait()
+                    if not self.running:
+                        return
+                else:
+                    self.rejected += 1
+                    raise OSCServerError("Worker-queue full; rejected message to '%s'" % str(key))
+
+            queue.append((func, args))
+            cond.notifyAll()
+        finally:
+            cond.release()
+
+    def _work(self, i):
+        """Worker-thread loop; run the jobs in the i-th queue, in order
+        """
+        queue = self._queues[i]
+        cond = self._conds[i]
+
+        while self.running:
+            cond.acquire()
+            try:
+                while self.running and not len(queue):
+                    # untimed; in Python 2 a timed wait() polls, waking up late.
+                    # submit() & stop() notify.
+                    cond.wait()
+
+                if not self.running:
+                    return
+
+                (func, args) = queue.popleft()
+
+                # wake up a submit() blocked on a full queue
+                cond.notifyAll()
+            finally:
+                cond.release()
+
+            func(*args)
+
 ######
 #
 # OSCServer classes
 #
 ######
 
-class OSCServer(UDPServer):
+class OSCDispatcherMixIn:
+    """Mix-in class for OSC-servers that keep callbacks for OSC-addresses in an OSCAddressSpace,
+    as 'self.callbacks', and dispatch incoming messages to them.
+    Used by OSCServer, and by the AsyncOSCServer of engine.py
+    """
+    def addMsgHandler(self, address, callback):
+        """Register a handler for an OSC-address
+          - 'address' is the OSC address-string.
+        the address-string should start with '/' and may not contain '*'
+          - 'callback' is the function called for incoming OSCMessages that match 'address'.
+        The callback-function will be called with the same arguments as the 'msgPrinter_handler' below
+        """
+        for chk in '*?,[]{}# ':
+            if chk in address:
+                raise OSCServerError("OSC-address string may not contain any characters in '*?,[]{}# '")
+
+        if type(callback) not in (types.FunctionType, types.MethodType):
+            raise OSCServerError("Message callback '%s' is not callable" % repr(callback))
+
+        if address != 'default':
+            address = '/' + address.strip('/')
+
+        self.callbacks[address] = callback
+
+    def delMsgHandler(self,address):
+        """Remove the registered handler for the given OSC-address
+        """
+        del self.callbacks[address]
+
+    def getOSCAddressSpace(self):
+        """Returns a list containing all OSC-addresses registerd with this Server.
+        """
+        return self.callbacks.keys()
+
+    def dispatchMessage(self, pattern, tags, data, client_address):
+        """Attmept to match the given OSC-address pattern, which may contain '*',
+        against all callbacks registered with the OSCServer.
+        Calls the matching callbacks and returns a list of the OSCMessages they return.
+        If no match is found, and a 'default' callback is registered, it calls that one,
+        or raises NoCallbackError if a 'default' callback is not registered.
+        """
+        if len(tags) != len(data):
+            raise OSCServerError("Malformed OSC-message; got %d typetags [%s] vs. %d values" % (len(tags), tags, len(data)))
+
+        replies = []
+        matched = 0
+        for addr in self.callbacks.match(pattern):
+            reply = self.callbacks[addr](pattern, tags, data, client_address)
+            matched += 1
+            if isinstance(reply, OSCMessage):
+                replies.append(reply)
+            elif reply != None:
+                raise TypeError("Message-callback %s did not return OSCMessage or None: %s" % (self.callbacks[addr], type(reply)))
+
+        if matched == 0:
+            if 'default' in self.callbacks:
+                reply = self.callbacks['default'](pattern, tags, data, client_address)
+                if isinstance(reply, OSCMessage):
+                    replies.append(reply)
+                elif reply != None:
+                    raise TypeError("Message-callback %s did not return OSCMessage or None: %s" % (self.callbacks['default'], type(reply)))
+            else:
+                raise NoCallbackError(pattern)
+
+        return replies
+
+class OSCServer(OSCDispatcherMixIn, UDPServer):
     """A Synchronous OSCServer
     Serves one request at-a-time, until the OSCServer is closed.
     The OSC address-pattern is matched against a set of OSC-adresses
@@ -1753,6 +2765,15 @@ class OSCServer(UDPServer):
     # DEBUG: print error-tracebacks (to stderr)?
     print_tracebacks = False
 
+    # hold bundles with a future timetag in the OSCTimetagScheduler thread,
+    # instead of sleeping in the request-handler.
+    # Off for this synchronous server, so all callbacks run in the thread serving requests;
+    # on for the Threading- & PoolingOSCServer, which run callbacks in threads anyway.
+    timetag_scheduling = False
+
+    # maximum number of datagrams received per wake-up by serve_batched()
+    batch_size = 64
+
     def __init__(self, server_address, client=None, return_port=0):
         """Instantiate an OSCServer.
           - server_address ((host, port) tuple): the local host & UDP-port
@@ -1764,7 +2785,7 @@ class OSCServer(UDPServer):
         """
         UDPServer.__init__(self, server_address, self.RequestHandlerClass)
 
-        self.callbacks = {}
+        self.callbacks = OSCAddressSpace()
         self.setReturnPort(return_port)
         self.error_prefix = ""
         self.info_prefix = "/info"
@@ -1773,6 +2794,8 @@ class OSCServer(UDPServer):
 
         self.running = False
         self.client = None
+        self.scheduler = None
+        self._scheduler_lock = threading.Lock()
 
         if client == None:
             self.client = OSCClient(server=self)
@@ -1815,13 +2838,146 @@ class OSCServer(UDPServer):
         while self.running:
             self.handle_request()    # this times-out when no data arrives.
 
+    def serve_batched(self):
+        """Handle requests until server is closed, without a RequestHandler per request.
+        Each time the socket becomes readable, all datagrams waiting on it (up to 'batch_size')
+        are received into preallocated buffers, then decoded & dispatched as a batch by handleBatch().
+        """
+        buffers = [memoryview(bytearray(self.max_packet_size)) for i in range(self.batch_size)]
+
+        self.running = True
+        self.socket.setblocking(0)
+        try:
+            while self.running:
+                try:
+                    (ready, _, _) = select.select([self.socket], [], [], self.socket_timeout)
+                except select.error, e:
+                    if e[0] == errno.EINTR:
+                        continue
+                    raise
+
+                if ready:
+                    self.handleBatch(self._receiveBatch(buffers))
+        finally:
+            # restore the timeout for serve_forever(), unless close() closed the socket
+            try:
+                self.socket.settimeout(self.socket_timeout)
+            except socket.error:
+                pass
+
+    def _receiveBatch(self, buffers):
+        """Receive waiting datagrams into the given buffers, until none are left or the buffers are full.
+        Returns a list of (data, client_address) tuples, where 'data' is a view on the buffer.
+        """
+        batch = []
+        for buf in buffers:
+            try:
+                (length, client_address) = self.socket.recvfrom_into(buf)
+            except socket.error, e:
+                if self.running and (e[0] not in (errno.EAGAIN, errno.EWOULDBLOCK)):
+                    self.printErr("while receiving: %s" % str(e))
+                break
+
+            batch.append((buf[:length], client_address))
+
+        return batch
+
+    def handleBatch(self, batch):
+        """Decode & dispatch a list of received (data, client_address) tuples
+        """
+        for (data, client_address) in batch:
+            try:
+                decoded = decodeOSC(data)
+                if len(decoded):
+                    self.dispatchPacket(decoded, client_address)
+            except Exception:
+                self.handle_error(None, client_address)
+
+    def dispatchPacket(self, decoded, client_address):
+        """Dispatch a decoded OSC-packet received by serve_batched(), and send any replies.
+        Bundles with a timetag in the future are held in the OSCTimetagScheduler,
+        or waited for if 'timetag_scheduling' is off.
+        """
+        replies = []
+        self._unbundleHeld(decoded, replies, client_address)
+        self.sendReplies(replies, client_address)
+
     def close(self):
-        """Stops serving requests, closes server (socket), closes used client
+        """Stops serving requests & the OSCTimetagScheduler-thread, closes server (socket), closes used client
         """
         self.running = False
+        if self.scheduler != None:
+            self.scheduler.stop()
+            if self.scheduler != threading.currentThread():
+                self.scheduler.join()
         self.client.close()
         self.server_close()
 
+    def sendReplies(self, replies, client_address):
+        """Send the replies returned by the callback(s) back to the originating client
+        as an OSCMessage or OSCBundle
+        """
+        if self.return_port:
+            client_address = (client_address[0], self.return_port)
+
+        if len(replies) > 1:
+            msg = OSCBundle()
+            for reply in replies:
+                msg.append(reply)
+        elif len(replies) == 1:
+            msg = replies[0]
+        else:
+            return
+
+        self.client.sendto(msg, client_address)
+
+    def scheduleBundle(self, decoded, client_address):
+        """Hold the given (decoded) OSC-bundle in the OSCTimetagScheduler
+        until its timetag. The scheduler-thread is started on first use.
+        """
+        self._scheduler_lock.acquire()
+        try:
+            if self.scheduler == None:
+                self.scheduler = OSCTimetagScheduler(self._dispatchBundle)
+                self.scheduler.start()
+        finally:
+            self._scheduler_lock.release()
+
+        self.scheduler.schedule(decoded, client_address)
+
+    def _unbundleHeld(self, decoded, replies, client_address):
+        """Recursive bundle-unpacking function for held bundles & for packets received by serve_batched().
+        Sub-bundles with a timetag in the future are scheduled again,
+        or waited for if 'timetag_scheduling' is off.
+        """
+        if decoded[0] != "#bundle":
+            replies += self.dispatchMessage(decoded[0], decoded[1][1:], decoded[2:], client_address)
+            return
+
+        now = time.time()
+        if decoded[1] > now:
+            if self.timetag_scheduling:
+                self.scheduleBundle(decoded, client_address)
+                return
+
+            time.sleep(decoded[1] - now)
+
+        for msg in decoded[2:]:
+            self._unbundleHeld(msg, replies, client_address)
+
+    def _dispatchBundle(self, decoded, client_address):
+        """Dispatch the contents of a held OSC-bundle, and send any replies.
+        Called from the OSCTimetagScheduler-thread.
+        """
+        replies = []
+        try:
+            for msg in decoded[2:]:
+                self._unbundleHeld(msg, replies, client_address)
+
+            self.sendReplies(replies, client_address)
+        except Exception:
+            self.handle_error(None, client_address)
+
     def __str__(self):
         """Returns a string containing this Server's Class-name, software-version and local bound address (if any)
         """
@@ -1885,35 +3041,6 @@ class OSCServer(UDPServer):
 
         self.error_prefix = pattern
 
-    def addMsgHandler(self, address, callback):
-        """Register a handler for an OSC-address
-          - 'address' is the OSC address-string.
-        the address-string should start with '/' and may not contain '*'
-          - 'callback' is the function called for incoming OSCMessages that match 'address'.
-        The callback-function will be called with the same arguments as the 'msgPrinter_handler' below
-        """
-        for chk in '*?,[]{}# ':
-            if chk in address:
-                raise OSCServerError("OSC-address string may not contain any characters in '*?,[]{}# '")
-
-        if type(callback) not in (types.FunctionType, types.MethodType):
-            raise OSCServerError("Message callback '%s' is not callable" % repr(callback))
-
-        if address != 'default':
-            address = '/' + address.strip('/')
-
-        self.callbacks[address] = callback
-
-    def delMsgHandler(self,address):
-        """Remove the registered handler for the given OSC-address
-        """
-        del self.callbacks[address]
-
-    def getOSCAddressSpace(self):
-        """Returns a list containing all OSC-addresses registerd with this Server.
-        """
-        return self.callbacks.keys()
-
     def addDefaultHandlers(self, prefix="", info_prefix="/info", error_prefix="/error"):
         """Register a default set of OSC-address handlers with this Server:
         - 'default' ->  noCallback_handler
@@ -2267,6 +3394,10 @@ class ForkingOSCServer(ForkingMixIn, OSCServer):
     # set the RequestHandlerClass, will be overridden by ForkingOSCServer & ThreadingOSCServer
     RequestHandlerClass = ThreadingOSCRequestHandler
 
+    # the request is handled in a child process, which can't reach the
+    # server's scheduler-thread. So the child holds the bundle itself.
+    timetag_scheduling = False
+
 class ThreadingOSCServer(ThreadingMixIn, OSCServer):
     """An Asynchronous OSCServer.
     This server starts a new thread to handle each incoming request.
@@ -2274,6 +3405,102 @@ class ThreadingOSCServer(ThreadingMixIn, OSCServer):
     # set the RequestHandlerClass, will be overridden by ForkingOSCServer & ThreadingOSCServer
     RequestHandlerClass = ThreadingOSCRequestHandler
 
+    # hold bundles with a future timetag in the OSCTimetagScheduler thread,
+    # instead of a request-thread sleeping for each one
+    timetag_scheduling = True
+
+class PoolingOSCServer(OSCServer):
+    """An Asynchronous OSCServer.
+    This server decodes each incoming request in the server-thread, and hands the
+    OSCMessages it contains to an OSCWorkerPool with a fixed number of worker-threads.
+    Messages to the same OSC-address are dispatched in the order they arrived.
+    Replies are sent per message, instead of per request.
+    """
+    # default number of worker-threads, queue-size per worker & overflow-policy.
+    # (see OSCWorkerPool)
+    workers = 4
+    queue_size = 256
+    overflow = 'drop_oldest'
+
+    # hold bundles with a future timetag in the OSCTimetagScheduler thread,
+    # instead of blocking the server-thread
+    timetag_scheduling = True
+
+    def __init__(self, server_address, client=None, return_port=0, workers=None, queue_size=None, overflow=None):
+        """Instantiate a PoolingOSCServer.
+          - server_address, client & return_port: see OSCServer
+          - workers (int): the number of worker-threads
+          - queue_size (int): the maximum number of queued messages per worker
+          - overflow (string): what to do with messages when a worker's queue is full;
+          'drop_oldest', 'block' or 'reject'
+        """
+        if workers == None:
+            workers = self.workers
+        if queue_size == None:
+            queue_size = self.queue_size
+        if overflow == None:
+            overflow = self.overflow
+
+        self.pool = OSCWorkerPool(workers, queue_size, overflow)
+
+        OSCServer.__init__(self, server_address, client, return_port)
+
+        self.pool.start()
+
+    def close(self):
+        """Stops serving requests & the worker-threads, closes server (socket), closes used client
+        """
+        self.pool.stop()
+        OSCServer.close(self)
+
+    def process_request(self, request, client_address):
+        """Decode the request, and hand its messages to the worker-pool.
+        Bundles with a timetag in the future are held in the OSCTimetagScheduler first.
+        """
+        decoded = decodeOSC(request[0])
+        if len(decoded):
+            self._submit(decoded, client_address)
+
+    def dispatchPacket(self, decoded, client_address):
+        """Hand the messages of a packet received by serve_batched() to the worker-pool
+        """
+        self._submit(decoded, client_address)
+
+    def _submit(self, decoded, client_address):
+        """Recursive bundle-unpacking function
+        """
+        if decoded[0] != "#bundle":
+            self.pool.submit(decoded[0], self._dispatchPooled, decoded, client_address)
+            return
+
+        timetag = decoded[1]
+        if (timetag > 0.) and (timetag > time.time()):
+            self.scheduleBundle(decoded, client_address)
+            return
+
+        for msg in decoded[2:]:
+            self._submit(msg, client_address)
+
+    def _dispatchBundle(self, decoded, client_address):
+        """Hand the contents of a held OSC-bundle to the worker-pool.
+        Called from the OSCTimetagScheduler-thread.
+        """
+        try:
+            for msg in decoded[2:]:
+                self._submit(msg, client_address)
+        except Exception:
+            self.handle_error(None, client_address)
+
+    def _dispatchPooled(self, decoded, client_address):
+        """Dispatch a single OSCMessage, and send any replies.
+        Called from a worker-thread.
+        """
+        try:
+            replies = self.dispatchMessage(decoded[0], decoded[1][1:], decoded[2:], client_address)
+            self.sendReplies(replies, client_address)
+        except Exception:
+            self.handle_error(None, client_address)
+
 ######
 #
 # OSCError classes
@@ -2342,16 +3569,28 @@ if __name__ == "__main__":
             help="Test ThreadingOSCServer")
     op.add_option("-f", "--forking", action="store_true", dest="forking",
             help="Test ForkingOSCServer")
+    op.add_option("-p", "--pooling", action="store_true", dest="pooling",
+            help="Test PoolingOSCServer")
+    op.add_option("-b", "--benchmark", action="store_true", dest="benchmark",
+            help="Benchmark decodeOSC on nested bundles and exit")
     op.add_option("-u", "--usage", action="help", help="show this help message and exit")
 
     op.set_defaults(listen=":%d" % default_port)
     op.set_defaults(sendto="")
     op.set_defaults(threading=False)
     op.set_defaults(forking=False)
+    op.set_defaults(pooling=False)
+    op.set_defaults(benchmark=False)
 
     # Parse args
     (opts, args) = op.parse_args()
 
+    if opts.benchmark:
+        for (depth, width) in ((1, 8), (3, 4), (8, 8)):
+            benchmarkDecode(depth, width)
+            print
+        sys.exit(0)
+
     addr, server_prefix = parseUrlStr(opts.listen)
     if addr != None and addr[0] != None:
         if addr[1] != None:
@@ -2491,6 +3730,8 @@ if __name__ == "__main__":
         s = ThreadingOSCServer(listen_address, c, return_port=listen_address[1])
     elif opts.forking:
         s = ForkingOSCServer(listen_address, c, return_port=listen_address[1])
+    elif opts.pooling:
+        s = PoolingOSCServer(listen_address, c, return_port=listen_address[1])
     else:
         s = OSCServer(listen_address, c, return_port=listen_address[1])
 
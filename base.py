@@ -1,13 +1,15 @@
-from functions import linear, rescale, nearest
+from functions import rescale, note_name, name_spelling
+from scheduler import VoiceTracker
 from timeit import default_timer
 import time
 from math import floor
+import numpy as np
 
 def test(time):
     time.sleep(1)
     return 0
 
-class Parameter():
+class Parameter(object):
 
     """Parameter.
 
@@ -15,40 +17,85 @@ class Parameter():
     an object to be able to retrieve its value with a given onset,
     using the "get_value" method.
 
+    The values and bounds are compiled into lookup tables once,
+    and recompiled only when either of them is replaced.
+
     """
 
     def __init__(self, arr, shift=0, length=1, quantize=1,
                  bounds=None, interp='linear'):
 
         if isinstance(arr, Parameter):
-            self.arr = arr.arr
             shift = arr.shift
             length = arr.length
             bounds = arr.bounds
             quantize = arr.quantize
-        elif hasattr(arr, '__iter__'):
-            self.arr = list(arr)
-        else:
-            self.arr = [arr]
+            arr = arr.arr
+        elif not hasattr(arr, '__iter__'):
+            arr = [arr]
 
         self.shift = shift
         self.length = length
         self.quantize = float(quantize)
-        self.bounds = bounds
         self.interp = interp
+        self._arr = tuple(arr)
+        self._bounds = bounds
+        self._compile()
+
+    @property
+    def arr(self):
+        return self._arr
+
+    @arr.setter
+    def arr(self, arr):
+        self._arr = tuple(arr)
+        self._compile()
+
+    @property
+    def bounds(self):
+        return self._bounds
+
+    @bounds.setter
+    def bounds(self, bounds):
+        self._bounds = bounds
+        self._compile()
+
+    def _compile(self):
+        """ Precompute lookup tables and rescale constants. """
+
+        arr = self._arr
+
+        # Values and distances to the next value, so interpolation
+        # is a single lookup per onset.
+        self._max_index = len(arr) - 1
+        self._values = tuple(float(y) for y in arr)
+        self._deltas = tuple(float(y1 - y0) for y0, y1 in zip(arr, arr[1:]))
+        self._values_array = np.array(self._values)
+        self._deltas_array = np.array(self._deltas + (0.0,))
+
+        if self._bounds:
+            ymin, ymax = self._bounds
+            self._rescale = rescale(arr, ymin, ymax)
+        else:
+            self._rescale = None
 
     def get_value(self, onset):
 
         elapsed = (float(onset) + self.shift) % self.length
+        xprop = elapsed / self.length
 
         if self.interp == 'linear':
-            val = float(linear(elapsed / self.length, self.arr))
+            x = self._max_index * xprop
+            x0 = int(floor(x))
+            if x0 >= self._max_index:
+                val = self._values[-1]
+            else:
+                val = self._values[x0] + self._deltas[x0] * (x - x0)
         elif self.interp == 'nearest':
-            val = float(nearest(elapsed / self.length, self.arr))
+            val = self._values[int(floor(xprop * len(self._values)))]
 
-        if self.bounds:
-            ymin, ymax = self.bounds
-            s, y, n = rescale(self.arr, ymin, ymax)
+        if self._rescale:
+            s, y, n = self._rescale
             val = (val - y) * s + n
 
         inv_qnt = 1.0 / self.quantize
@@ -56,6 +103,29 @@ class Parameter():
 
         return val
 
+    def get_values(self, onsets):
+        """ Return values for an array of onsets at once. """
+
+        onsets = np.asarray(onsets, dtype=float)
+        xprops = ((onsets + self.shift) % self.length) / self.length
+
+        if self.interp == 'linear':
+            x = self._max_index * xprops
+            x0 = np.minimum(np.floor(x).astype(int), self._max_index)
+            vals = self._values_array[x0] + self._deltas_array[x0] * (x - x0)
+        elif self.interp == 'nearest':
+            index = np.floor(xprops * len(self._values)).astype(int)
+            vals = self._values_array[index]
+
+        if self._rescale:
+            s, y, n = self._rescale
+            vals = (vals - y) * s + n
+
+        inv_qnt = 1.0 / self.quantize
+        vals = np.floor(vals * inv_qnt) / inv_qnt
+
+        return vals
+
 
 class Pattern(object):
     """docstring for Pattern"""
@@ -70,58 +140,88 @@ class Pattern(object):
         self.velocity = Parameter(velocity)
         self._prev_time = 0
 
+    def reset(self, song_time=0):
+        """ Start collecting notes from song_time. """
+        self._prev_time = song_time
+
+    def next_onset(self, start, stop):
+        """ Return first onset from start to stop, or None. """
+
+        onsets = []
+        for rhythm in self.rhythm:
+            ons, _ = rhythm.get_onsets(start, stop)
+            onsets += [on for on in ons if on >= start]
+
+        return min(onsets) if onsets else None
+
     def get_notes(self, song_time):
 
         onsets, indices = [], []
         for rhythm in self.rhythm:
             ons, ind = rhythm.get_onsets(self._prev_time, song_time)
-            if ons:
-                print ons
             onsets += ons
             indices += ind
 
         self._prev_time = song_time
 
+        if not onsets:
+            return []
+
+        # Resolve pitches for all onsets at once
+        rows = np.arange(len(onsets))
+        indices = np.array(indices, dtype=int)
+        chords, sizes = self.notes.get_indices_array(onsets)
+        midis, pitches, _, letters = self.diatonic.get_notes_array(onsets)
+
+        notes = chords[rows, indices % sizes]
+        in_scale = notes % 7
+        extra_octaves = indices // sizes + notes // 7
+        midi = (midis[rows, in_scale] + extra_octaves * 12).tolist()
+
+        # Compact spelling: letter, and accidental in the higher bits.
+        # The octave of the name follows from the midi number.
+        spelling = (pitches[rows, in_scale] * 8 +
+                    (letters + in_scale) % 7).tolist()
+
+        # Evaluate note parameters for all onsets at once
+        channels = self.channel.get_values(onsets).tolist()
+        durations = self.duration.get_values(onsets).tolist()
+        velocities = self.velocity.get_values(onsets).tolist()
+
         out = []
         for i, onset in enumerate(onsets):
 
-            # Create parameters for Note
-            index = indices[i]
-            notes = self.notes.get_indices(onset)
-
-            midis, (names, pitches, octaves) = self.diatonic.get_notes(onset)
-            index_in_notes = index % len(notes)
-            index_in_midi = notes[index_in_notes] % 7
-            extra_octaves = index // len(notes) + notes[index_in_notes] // 7
-            midi = midis[index_in_midi] + extra_octaves * 12
-            name = names[index_in_midi]
-            pitch = pitches[index_in_midi]
-            sign = '#'*pitch if pitch > 0 else 'b'*abs(pitch)
-            octave = octaves[index_in_midi] + extra_octaves
-            full_name = name + sign + str(octave)
-
-            # Note
-            note = Note(midi=midi,
-                        name=full_name,
+            # Note, named only when asked for
+            note = Note(midi=midi[i],
+                        name=None,
                         onset=onset,
-                        channel=self.channel.get_value(onset),
-                        duration=self.duration.get_value(onset),
-                        velocity=self.velocity.get_value(onset))
+                        channel=channels[i],
+                        duration=durations[i],
+                        velocity=velocities[i],
+                        spelling=spelling[i])
 
             out.append(note)
 
         return out
 
 
-class Note():
+class Note(object):
 
     """Note
 
     The note class contains all the information of a note.
     The onset and duration values are relative to bar_duration.
 
+    If name is None, it is looked up from the midi number and
+    spelling, a compact letter and accidental code (see
+    functions.note_spelling), when it is asked for.
+
     """
 
+    # No per-instance __dict__; patterns create many short-lived notes.
+    __slots__ = ('channel', 'onset', 'start', 'duration', 'velocity',
+                 'midi', 'spelling', '_name')
+
     def __init__(self,
                  midi=64,
                  name='C5',
@@ -129,7 +229,8 @@ class Note():
                  start=0,
                  channel=0,
                  duration=0,
-                 velocity=80):
+                 velocity=80,
+                 spelling=None):
 
         # Attributes
         self.channel = channel
@@ -138,7 +239,20 @@ class Note():
         self.duration = duration
         self.velocity = velocity
         self.midi = midi
-        self.name = name
+        self.spelling = spelling
+        self._name = name
+
+    @property
+    def name(self):
+        if self._name is None:
+            return note_name(self.midi, self.spelling)
+        return self._name
+
+    @name.setter
+    def name(self, name):
+        # The spelling follows from the new name.
+        self._name = name
+        self.spelling = None
 
     def __eq__(self, other):
         """ Compare two notes """
@@ -150,24 +264,39 @@ class Note():
 
         return midi_eq and chan_eq
 
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        """ Hash on channel and midi note, like __eq__ """
+        return hash((self.channel, self.midi))
+
     def __str__(self):
         return self.name
 
+    def get_spelling(self):
+        """ Return compact spelling, from the name if not given. """
+        if self.spelling is None:
+            return name_spelling(self._name)
+        return self.spelling
+
     def on_msg(self):
-        vals = [int(self.midi),
+        """ Return note on message arguments (int, int, int, int, float):
+        midi, velocity, channel, spelling and onset. """
+        return [int(self.midi),
                 int(self.velocity),
                 int(self.channel),
-                self.name,
-                self.onset]
-        return '_'.join([str(val) for val in vals])
+                self.get_spelling(),
+                float(self.onset)]
 
     def off_msg(self):
-        vals = [int(self.midi),
+        """ Return note off message arguments (int, int, int, int, float):
+        midi, velocity, channel, spelling and offset. """
+        return [int(self.midi),
                 int(self.velocity),
                 int(self.channel),
-                self.name,
-                self.onset + self.duration]
-        return '_'.join([str(val) for val in vals])
+                self.get_spelling(),
+                float(self.onset + self.duration)]
 
 
 class Clock():
@@ -223,20 +352,42 @@ class Player():
     onset, using output instance, and turned off after
     note offset.
 
+    Between iterations, the player sleeps until the next
+    onset or offset. It looks ahead at most "lookahead"
+    seconds, so it still wakes up that often for parameter
+    changes, and sleeps at least "min_sleep" seconds.
+
+    Each channel plays at most "polyphony" notes at once (an int
+    for all channels, a dictionary of channel to int, or None for
+    no limit). When a channel is full, its oldest or quietest note
+    is stolen, as set by "steal". Notes that are retriggered or
+    stolen are turned off "release_gap" seconds before the note
+    that takes their voice, so the note off arrives first at servers
+    that handle datagrams in threads. A note that started less than
+    "release_gap" seconds before is turned off at its own onset.
+
     """
 
     def __init__(self,
                  clock,
                  output,
-                 patterns=[]):
+                 patterns=[],
+                 lookahead=.1,
+                 min_sleep=.001,
+                 polyphony=None,
+                 steal='oldest',
+                 release_gap=.01):
 
         self.clock = clock
         self.output = output
         self.patterns = patterns
+        self.lookahead = lookahead
+        self.min_sleep = min_sleep
+        self.release_gap = release_gap
 
         self.is_running = False
         self._notes = []
-        self._played = []
+        self._played = VoiceTracker(polyphony, steal)
 
     def run(self):
         """ Cycle and play notes. """
@@ -246,21 +397,47 @@ class Player():
 
         try:
             while self.is_running:
-                song_time = self.clock.get_songtime()
-                # Get notes from patterns.
-                self._notes = []
-                for pat in self.patterns:
-                    self._notes += pat.get_notes(song_time)
-                self.eval_notes()
-                # Update clock.
-                self.clock.update()
-                # Dont hog cpu.
-                time.sleep(.04)
+                self.step()
+                # Dont hog cpu, wait for next event.
+                time.sleep(self.next_wait())
 
         except KeyboardInterrupt:
             print 'Aborted.'
             self.output.stop()
 
+    def step(self):
+        """ Update clock, and play notes up to current song time. """
+
+        # Update clock first, so notes due at this wake are played now.
+        self.clock.update()
+        song_time = self.clock.get_songtime()
+        # Get notes from patterns.
+        self._notes = []
+        for pat in self.patterns:
+            self._notes += pat.get_notes(song_time)
+        self.eval_notes()
+
+    def next_wait(self):
+        """ Return seconds until next onset or offset. """
+
+        song_time = self.clock.get_songtime()
+        cycle = self.clock.cycle.get_value(song_time)
+        wait = self.lookahead
+
+        # Next onset within lookahead window.
+        stop = song_time + self.lookahead / cycle
+        for pat in self.patterns:
+            onset = pat.next_onset(song_time, stop)
+            if onset is not None:
+                wait = min(wait, (onset - song_time) * cycle)
+
+        # Next offset of played notes.
+        offset = self._played.next_offset()
+        if offset is not None:
+            wait = min(wait, offset - self.clock.timer())
+
+        return max(wait, self.min_sleep)
+
     def eval_notes(self):
         """ Play and turn off notes. """
 
@@ -274,38 +451,63 @@ class Player():
         for note in self._notes:
 
             # Play the note
-            real_onset = bar_onset + (note.onset - bar) * cycle
-            # If the note is already played
-            # remove previous instance, so it
-            # is not turned off at the offset
-            # of previous instance.
-            if note in self._played:
-                self.output.note_off(note, real_onset-.01)
-                self._played.remove(note)
-                
-            self.output.note_on(note, real_onset)
-
-            # And store in played list.
-            self._played.append(note)
-
-        # Turn them off.
-        to_remove = []
-        for note in self._played:
-
             real_onset = bar_onset + (note.onset - bar) * cycle
             real_offset = real_onset + note.duration * cycle
 
-#            if note.channel ==3:
-#                print real_onset, real_offset
-    
-            # If offset has passed,
-            # turn the note off.
-            if self.clock.timer() > real_offset:
-                # Just like with onset, we pass the real onset time
-                self.output.note_off(note, real_offset)
+            # Take a voice. The note it retriggers, and notes whose
+            # voice is stolen, are turned off now instead of at
+            # their own offset, but not before their own onset.
+            release = real_onset - self.release_gap
+            for off, off_onset in self._played.start(note, real_onset,
+                                                     real_offset):
+                self.output.note_off(off, max(release, off_onset))
 
-                # And remove from played list.
-                to_remove.append(note)
+            self.output.note_on(note, real_onset)
 
-        for note in to_remove:
-            self._played.remove(note)
+        # Turn off notes of which the offset has passed.
+        # Just like with onset, we pass the real offset time.
+        now = self.clock.timer()
+        for note, real_offset in self._played.pop_due(now):
+            self.output.note_off(note, real_offset)
+
+        # Send notes collected by a batching output.
+        self.output.flush()
+
+
+if __name__ == "__main__":
+    import gc
+    import sys
+    from melody import Diatonic, Chord
+    from rhythm import Rhythm
+
+    class DictNote(object):
+        """ Note with a per-instance __dict__, as before __slots__. """
+        def __init__(self, **kwargs):
+            self.__dict__.update(kwargs)
+
+    def allocations(note):
+        """ Return objects and bytes allocated for a note. """
+        if hasattr(note, '__dict__'):
+            return 2, sys.getsizeof(note) + sys.getsizeof(note.__dict__)
+        return 1, sys.getsizeof(note)
+
+    kwargs = dict(midi=60, name=None, onset=0.5, start=0, channel=0,
+                  duration=1.0, velocity=80, spelling=0)
+    for label, note in (('dict note', DictNote(**kwargs)),
+                        ('slots note', Note(**kwargs))):
+        print '%-10s: %d objects, %d bytes per note' % (
+            (label,) + allocations(note))
+
+    # Notes of a dense pattern; GC generation 0 counts allocations
+    # of container objects minus deallocations.
+    pattern = Pattern(Diatonic(), Chord(num_notes=4),
+                      [Rhythm(steps=16, pulses=16, num_notes=8)])
+    gc.disable()
+    gc.collect()
+    notes = []
+    for step in xrange(1, 401):
+        notes += pattern.get_notes(step * .25)
+    allocated = gc.get_count()[0]
+    gc.enable()
+    print 'pattern   : %d notes, %d tracked objects (%.2f per note)' % (
+        len(notes), allocated, float(allocated) / len(notes))
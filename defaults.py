@@ -7,3 +7,7 @@ MAJ_INDICES = [0, 2, 4, 5, 7, 9, 11]
 NOTE_ON = [i for i in range(144, 160)]
 NOTE_OFF = [i for i in range(128, 144)]
 PRESSURE = [i for i in range(160, 176)]
+
+# Caches
+RHYTHM_CACHE_SIZE = 256
+SCALE_CACHE_SIZE = 1024
@@ -0,0 +1,251 @@
+from OSC import OSCMessage, OSCAddressSpace, OSCDispatcherMixIn, decodeOSC
+from base import Player
+import asyncore
+import errno
+import heapq
+import socket
+import sys
+import time
+
+
+class EventLoop(object):
+
+    """EventLoop
+
+    Single threaded loop for timers and sockets. Timers are kept in
+    a heap and called at their time. In between, the loop waits for
+    socket events (asyncore) until the next timer is due. Any number
+    of players, clients and servers can share one loop.
+
+    """
+
+    def __init__(self, timer=None):
+
+        self.timer = timer if timer else time.time
+        self.map = {}
+        self.is_running = False
+        self._timers = []
+        self._count = 0
+
+    def time(self):
+        return self.timer()
+
+    def call_at(self, when, callback, *args):
+        """ Call callback with args at time "when". """
+
+        entry = [when, self._count, callback, args]
+        self._count += 1
+        heapq.heappush(self._timers, entry)
+        return entry
+
+    def call_later(self, delay, callback, *args):
+        """ Call callback with args after "delay" seconds. """
+        return self.call_at(self.time() + delay, callback, *args)
+
+    def cancel(self, entry):
+        """ Cancel a timer returned by call_at or call_later. """
+        entry[2] = None
+
+    def _run_timers(self):
+        now = self.time()
+        while self._timers and self._timers[0][0] <= now:
+            _, _, callback, args = heapq.heappop(self._timers)
+            if callback is not None:
+                callback(*args)
+
+    def run_once(self, max_wait=1.0):
+        """ Wait for socket events until next timer, then run timers. """
+
+        wait = max_wait
+        if self._timers:
+            wait = min(wait, max(self._timers[0][0] - self.time(), 0))
+
+        if self.map:
+            asyncore.loop(timeout=wait, map=self.map, count=1)
+        else:
+            time.sleep(wait)
+
+        self._run_timers()
+
+    def run(self):
+        """ Run until stopped. """
+
+        self.is_running = True
+        while self.is_running:
+            self.run_once()
+
+    def stop(self):
+        self.is_running = False
+
+
+class AsyncOSCClient(asyncore.dispatcher):
+
+    """AsyncOSCClient
+
+    Non-blocking OSC client on an EventLoop. Sent messages are
+    queued and written when the socket is writable.
+
+    """
+
+    def __init__(self, loop, address=None):
+
+        asyncore.dispatcher.__init__(self, map=loop.map)
+        self.loop = loop
+        self.create_socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._queue = []
+        if address:
+            self.connect(address)
+
+    def handle_connect(self):
+        pass
+
+    def readable(self):
+        return False
+
+    def writable(self):
+        return bool(self._queue)
+
+    def send(self, msg, timeout=None):
+        """ Queue OSCMessage (or OSCBundle) for sending. Sending never
+        blocks, so timeout is not used. """
+
+        self.sendto(msg, None)
+
+    def sendBinary(self, binary, timeout=None):
+        """ Queue encoded OSC data. Buffers are copied, as they may be reused. """
+        self._queue_binary(binary, None)
+
+    def sendto(self, msg, address, timeout=None):
+        """ Queue OSCMessage (or OSCBundle) for sending to address. """
+
+        if not isinstance(msg, OSCMessage):
+            raise TypeError("'msg' argument is not an OSCMessage or OSCBundle object")
+
+        self._queue_binary(msg.getBinary(), address)
+
+    def _queue_binary(self, binary, address):
+        if isinstance(binary, memoryview):
+            binary = binary.tobytes()
+        self._queue.append((binary, address))
+
+    def handle_write(self):
+        while self._queue:
+            binary, address = self._queue[0]
+            try:
+                if address:
+                    self.socket.sendto(binary, address)
+                else:
+                    self.socket.send(binary)
+            except socket.error, e:
+                if e[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return
+                if e[0] in asyncore._DISCONNECTED:
+                    self.handle_close()
+                    return
+                # Drop the message; sending it again would fail again.
+                sys.stderr.write("%s: dropped message: %s\n" % (
+                    self.__class__.__name__, str(e)))
+            self._queue.pop(0)
+
+
+class AsyncOSCServer(OSCDispatcherMixIn, asyncore.dispatcher):
+
+    """AsyncOSCServer
+
+    Non-blocking OSC server on an EventLoop. Bundles with a timetag
+    in the future are not held by a sleeping thread, but scheduled
+    on the loop, and dispatched at their time. Handlers are registered
+    and dispatched as in the OSCServer (OSCDispatcherMixIn). Replies
+    returned by handlers are not sent.
+
+    """
+
+    def __init__(self, loop, server_address):
+
+        asyncore.dispatcher.__init__(self, map=loop.map)
+        self.loop = loop
+        self.callbacks = OSCAddressSpace()
+        self.create_socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.set_reuse_addr()
+        self.bind(server_address)
+
+    def writable(self):
+        return False
+
+    def handle_read(self):
+        try:
+            data, client_address = self.socket.recvfrom(65536)
+        except socket.error:
+            return
+
+        decoded = decodeOSC(data)
+        if len(decoded):
+            self._unbundle(decoded, client_address)
+
+    def _unbundle(self, decoded, client_address):
+        """ Dispatch message, or schedule bundle contents. """
+
+        if decoded[0] != "#bundle":
+            self.dispatchMessage(decoded[0], decoded[1][1:], decoded[2:],
+                                 client_address)
+            return
+
+        timetag = decoded[1]
+        if (timetag > 0.) and (timetag > self.loop.time()):
+            self.loop.call_at(timetag, self._unbundle_all,
+                              decoded[2:], client_address)
+        else:
+            self._unbundle_all(decoded[2:], client_address)
+
+    def _unbundle_all(self, msgs, client_address):
+        try:
+            for msg in msgs:
+                self._unbundle(msg, client_address)
+        except Exception:
+            self.handle_error()
+
+    def handle_error(self):
+        """ Report errors in callbacks, and keep serving. """
+        (e_type, e) = sys.exc_info()[:2]
+        sys.stderr.write("%s: %s: %s\n" % (self.__class__.__name__,
+                                            e_type.__name__, str(e)))
+
+
+class AsyncPlayer(Player):
+
+    """AsyncPlayer
+
+    Player that runs on an EventLoop. Instead of sleeping, each
+    step schedules the next one at the next onset or offset, so
+    many players can run in one thread.
+
+    """
+
+    def __init__(self, loop, clock, output, patterns=[], **kwargs):
+
+        Player.__init__(self, clock, output, patterns, **kwargs)
+        self.loop = loop
+        self._timer = None
+
+    def start(self):
+        """ Start playing on the loop. """
+
+        self.is_running = True
+        self.clock.reset()
+        self._timer = self.loop.call_later(0, self._tick)
+
+    def stop(self):
+        """ Stop playing, and stop the output. """
+
+        self.is_running = False
+        if self._timer is not None:
+            self.loop.cancel(self._timer)
+            self._timer = None
+        self.output.stop()
+
+    def _tick(self):
+        if not self.is_running:
+            return
+
+        self.step()
+        self._timer = self.loop.call_later(self.next_wait(), self._tick)
@@ -1,4 +1,8 @@
 from math import floor, e
+from collections import OrderedDict
+from defaults import RHYTHM_CACHE_SIZE, SCALE_CACHE_SIZE
+from defaults import MAJ_C, MAJ_SCALE, MAJ_INDICES
+import numpy as np
 import sys
 
 def linear(xprop, ys):
@@ -82,6 +86,274 @@ def euclidean_rhythm(steps=16, pulses=4, shift=0, length=1, onset=False):
     return output
 
 
+def _repeat_bits(bits, size, times):
+    """ Return bitmask of "bits" (of "size" steps) repeated "times". """
+    if times <= 0:
+        return 0
+    if size == 0:
+        return bits
+    unit = (1 << size) - 1
+    return bits * (((1 << (size * times)) - 1) // unit)
+
+
+def euclidean_bitmask(steps=16, pulses=4, shift=0):
+    """euclidean bitmask
+
+    Returns the pattern of "euclidean_rhythm" as an integer, where
+    bit i is set if step i holds a pulse. Instead of building lists,
+    Euclid's algorithm runs on the number of groups: each iteration
+    only combines two group bitmasks, so the number of integer
+    operations grows with log(steps). The output is identical to
+    "euclidean_rhythm", which has max(pulses, 0) + max(steps - pulses, 0)
+    steps.
+
+    """
+
+    # Groups in pattern (a) and suffix (b), as (bits, size)
+    a, a_bits, a_size = max(pulses, 0), 1, 1
+    b, b_bits, b_size = max(steps - pulses, 0), 0, 1
+
+    while b > 1:
+        if a == 0:
+            # All suffix groups join into a single group
+            b_bits, b_size = _repeat_bits(b_bits, b_size, b), b_size * b
+            b = 1
+            break
+
+        # Distribute suffix groups over pattern groups
+        q, r = divmod(b, a)
+        rest_bits = _repeat_bits(b_bits, b_size, q)
+        rest_size = b_size * q
+        new_a_bits = a_bits | ((rest_bits | (b_bits << rest_size)) << a_size)
+        new_b_bits = a_bits | (rest_bits << a_size)
+        a, a_bits, a_size, b, b_bits, b_size = (
+            r, new_a_bits, a_size + rest_size + b_size,
+            a - r, new_b_bits, a_size + rest_size)
+
+    # Concatenate pattern and suffix groups
+    mask = _repeat_bits(a_bits, a_size, a)
+    mask |= _repeat_bits(b_bits, b_size, b) << (a_size * a)
+    size = a_size * a + b_size * b
+
+    # Shift, like slicing in euclidean_rhythm
+    if 0 < abs(shift) < size:
+        shift %= size
+        mask = ((mask << shift) | (mask >> (size - shift))) & ((1 << size) - 1)
+
+    return mask
+
+
+def euclidean_array(steps=16, pulses=4, shift=0):
+    """ Return euclidean rhythm as a boolean numpy array. """
+    size = max(pulses, 0) + max(steps - pulses, 0)
+    mask = euclidean_bitmask(steps, pulses, shift)
+    digits = bin(mask)[2:].zfill(size)[::-1] if size else ''
+    return np.frombuffer(digits.encode('ascii'), dtype=np.uint8) == ord('1')
+
+
+class LRUCache(object):
+
+    """LRUCache
+
+    Dictionary with a maximum number of items. When full, the least
+    recently used item is evicted. Hits and misses are counted, so
+    the hit rate can be inspected. A maxsize of None never evicts.
+
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        """ Return cached value and mark it as recently used. """
+        try:
+            value = self._items.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self._items[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """ Store value, evicting least recently used items if full. """
+        self._items.pop(key, None)
+        self._items[key] = value
+        if self.maxsize is not None:
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def resize(self, maxsize):
+        """ Change the maximum number of items. """
+        self.maxsize = maxsize
+        if maxsize is not None:
+            while len(self._items) > maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        """ Remove all items and reset counters. """
+        self._items.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        """ Return dictionary with cache statistics. """
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._items),
+                'maxsize': self.maxsize}
+
+
+RHYTHM_CACHE = LRUCache(RHYTHM_CACHE_SIZE)
+
+
+def cached_euclidean_rhythm(steps=16, pulses=4, shift=0, length=1,
+                            cache=RHYTHM_CACHE):
+    """cached euclidean rhythm
+
+    Returns the pattern and onsets of "euclidean_rhythm" as tuples.
+    Results are stored in an LRUCache keyed on the arguments, so
+    repeated calls with the same rhythm are a dictionary lookup.
+
+    """
+
+    key = (steps, pulses, shift, length)
+    output = cache.get(key)
+    if output is None:
+        pattern = tuple(euclidean_array(steps, pulses, shift).tolist())
+        onsets = tuple(i*(1.0/steps)*length
+                       for i in range(steps) if pattern[i])
+        output = (pattern, onsets)
+        cache.put(key, output)
+
+    return output
+
+
+def scale_table(key='C', pitch=0, octave=5, rotate=0, transpose=0,
+                alter=((0, 0),), ascending=False):
+    """scale table
+
+    Returns the midi numbers of a diatonic scale, and the names,
+    pitches and octaves of its notes, as tuples. The "alter" argument
+    holds (index, alteration) pairs, and "ascending" tells if the scale
+    was transposed upwards, which makes the names prefer flats.
+
+    """
+
+    ki = MAJ_C.index(key)
+
+    # Root
+    root = MAJ_INDICES[ki]
+    root += transpose + pitch
+    root += octave * 12
+
+    # Distances
+    distances = roll(MAJ_SCALE, rotate)
+    for index, alteration in alter:
+        distances[index] += alteration
+
+    # Midi
+    midi = add_single(cumsum(distances), root)
+
+    # Transpose
+    maj_diff = diff_single(MAJ_INDICES, root % 12)
+    min_diff = min(abs_array(maj_diff))
+    min_diff *= -1 if ascending else 1
+
+    # New index
+    index = maj_diff.index(min_diff)
+
+    # Pitches
+    pitch = root % 12 - MAJ_INDICES[index]
+    whole_scale = roll(MAJ_SCALE, index)
+    whole_indices = cumsum(whole_scale)
+    whole_altered = diff(MAJ_INDICES, whole_indices)
+    indices = cumsum(distances)
+    pitches = diff(indices, MAJ_INDICES)
+    pitches = add(whole_altered, pitches)
+    pitches = add_single(pitches, pitch)
+
+    names = roll(MAJ_C, index)
+    octaves = [i // 12 for i in midi]
+
+    return tuple(midi), (tuple(names), tuple(pitches), tuple(octaves))
+
+
+SCALE_CACHE = LRUCache(SCALE_CACHE_SIZE)
+
+
+def cached_scale_table(key='C', pitch=0, octave=5, rotate=0, transpose=0,
+                       alter=((0, 0),), ascending=False, cache=SCALE_CACHE):
+    """cached scale table
+
+    Returns the output of "scale_table". Results are stored in an
+    LRUCache keyed on the arguments ("alter" as a tuple of pairs), so
+    a scale that was used before is a dictionary lookup.
+
+    """
+
+    key = (key, pitch, octave, rotate, transpose, alter, ascending)
+    output = cache.get(key)
+    if output is None:
+        output = scale_table(*key)
+        cache.put(key, output)
+
+    return output
+
+
+def note_spelling(letter, accidental):
+    """ Return compact spelling of a note: the index of its letter
+    in MAJ_C in the lowest 3 bits, and its accidental (in semitones,
+    negative for flats) in the higher bits. """
+    return (accidental << 3) | letter
+
+
+def name_spelling(name):
+    """ Return compact spelling of a note name, like 'C#5'. """
+    return note_spelling(MAJ_C.index(name[0]),
+                         name.count('#') - name.count('b'))
+
+
+SPELLING_TABLE = {}
+
+
+def note_name(midi, spelling):
+    """note name
+
+    Returns the name of a midi note with the given compact spelling
+    (see "note_spelling"). The octave is midi // 12. The names of
+    midi notes 0 to 127 are built once per spelling, and looked up
+    in SPELLING_TABLE after that.
+
+    """
+
+    midi = int(midi)
+    if 0 <= midi < 128:
+        names = SPELLING_TABLE.get(spelling)
+        if names is None:
+            names = [_spell(m, spelling) for m in range(128)]
+            SPELLING_TABLE[spelling] = names
+        return names[midi]
+
+    return _spell(midi, spelling)
+
+
+def _spell(midi, spelling):
+    """ Build name of midi note with compact spelling. """
+    accidental = spelling >> 3
+    sign = '#'*accidental if accidental > 0 else 'b'*abs(accidental)
+    return MAJ_C[spelling & 7] + sign + str(midi // 12)
+
+
 def cumsum(arr):
     """ Cumulative sum. Start at zero. Exclude arr[-1]. """
     return [sum(arr[:i]) for i in range(len(arr))]
@@ -1,7 +1,7 @@
 from base import Parameter
-from defaults import MAJ_C, MAJ_SCALE, MAJ_INDICES
-from functions import roll, cumsum, diff_single
-from functions import add_single, abs_array, diff, add
+from defaults import MAJ_C
+from functions import cached_scale_table
+import numpy as np
 
 
 class Diatonic():
@@ -37,56 +37,58 @@ class Diatonic():
         self.alter += (Parameter(alter[0]), Parameter(alter[1]))
 
     def get_notes(self, onset):
-        """ """
+        """ Return midi numbers, and names, pitches and octaves
+        of the scale at onset. The scale tables are cached. """
 
         # Get values
         octave = int(self.octave.get_value(onset))
         rotate = int(self.rotate.get_value(onset))
         transpose = int(self.transpose.get_value(onset))
+        alter = tuple((int(alt[0].get_value(onset)),
+                       int(alt[1].get_value(onset)))
+                      for alt in self.alter)
 
-        ki = MAJ_C.index(self.key)
+        # Transpose direction
+        ascending = transpose > self._transposed
+        self._transposed = transpose
 
-        # Root
-        root = MAJ_INDICES[ki]
-        root += transpose + self.pitch
-        root += octave * 12
+        return cached_scale_table(self.key, self.pitch, octave, rotate,
+                                  transpose, alter, ascending)
 
-        # Distances
-        distances = MAJ_SCALE
-        distances = roll(distances, rotate)
-        for alt in self.alter:
-            index = int(alt[0].get_value(onset))
-            alter = int(alt[1].get_value(onset))
-            distances[index] += alter
+    def get_notes_array(self, onsets):
+        """ Return scales for an array of onsets at once: midi numbers,
+        pitches and octaves as arrays with a row of 7 per onset, and an
+        array with the index in MAJ_C of the first note name of each
+        scale. """
 
-        # Midi
-        midi = cumsum(distances)
-        midi = add_single(midi, root)
+        octaves = self.octave.get_values(onsets).astype(int).tolist()
+        rotates = self.rotate.get_values(onsets).astype(int).tolist()
+        transposes = self.transpose.get_values(onsets).astype(int).tolist()
+        alters = zip(*[zip(alt[0].get_values(onsets).astype(int).tolist(),
+                           alt[1].get_values(onsets).astype(int).tolist())
+                       for alt in self.alter]) or [()] * len(onsets)
 
-        # Transpose
-        direction = transpose - self._transposed
-        self._transposed = transpose
-        maj_diff = diff_single(MAJ_INDICES, root % 12)
-        min_diff = min(abs_array(maj_diff))
-        min_diff *= -1 if direction > 0 else 1
+        midis, pitches, octs, letters = [], [], [], []
+        for i in range(len(onsets)):
 
-        # New index
-        index = maj_diff.index(min_diff)
+            # Transpose direction, in onset order
+            ascending = transposes[i] > self._transposed
+            self._transposed = transposes[i]
 
-        # Pitches
-        pitch = root % 12 - MAJ_INDICES[index]
-        whole_scale = roll(MAJ_SCALE, index)
-        whole_indices = cumsum(whole_scale)
-        whole_altered = diff(MAJ_INDICES, whole_indices)
-        indices = cumsum(distances)
-        pitches = diff(indices, MAJ_INDICES)
-        pitches = add(whole_altered, pitches)
-        pitches = add_single(pitches, pitch)
+            midi, (name, pitch, octave) = cached_scale_table(
+                self.key, self.pitch, octaves[i], rotates[i],
+                transposes[i], tuple(alters[i]), ascending)
 
-        names = roll(MAJ_C, index)
-        octaves = [i // 12 for i in midi]
+            midis.append(midi)
+            pitches.append(pitch)
+            octs.append(octave)
+            letters.append(MAJ_C.index(name[0]))
 
-        return midi, (names, pitches, octaves)
+        shape = (len(onsets), 7)
+        return (np.array(midis, dtype=int).reshape(shape),
+                np.array(pitches, dtype=int).reshape(shape),
+                np.array(octs, dtype=int).reshape(shape),
+                np.array(letters, dtype=int))
 
 
 class Chord():
@@ -123,8 +125,35 @@ class Chord():
 
         return indices
 
+    def get_indices_array(self, onsets):
+        """ Return chords for an array of onsets at once, as an array
+        with a row per onset (padded with zeros), and an array with
+        the number of notes in each chord. """
+
+        nums = self.num_notes.get_values(onsets).astype(int)
+        roots = self.root.get_values(onsets).astype(int)
+        skips = self.skip.get_values(onsets).astype(int)
+        inverses = self.inverse.get_values(onsets).astype(int)
+
+        if len(nums) and nums.min() < 1:
+            raise ValueError("Chord needs at least one note")
+
+        # Create chords
+        width = nums.max() if len(nums) else 0
+        steps = np.arange(width)
+        indices = steps * (skips[:, None] + 1) + roots[:, None]
+
+        # Inverse: of the first "inverse" notes (wrapping around),
+        # each is lowered an octave for every time it is reached.
+        inverses = np.maximum(inverses, 0)[:, None]
+        lowered = (inverses // nums[:, None] +
+                   (steps < inverses % nums[:, None]))
+        indices -= lowered * 8
+        indices[steps >= nums[:, None]] = 0
+
+        return indices, nums
+
 if __name__ == "__main__":
-    import numpy as np
     import matplotlib.pyplot as plt
     c = Chord(root=[1,2],
               inverse=Parameter([0,5],
@@ -0,0 +1,204 @@
+from base import Parameter
+from render import Renderer
+import heapq
+import struct
+import tempfile
+
+# Status bytes
+NOTE_OFF_STATUS = 0x80
+NOTE_ON_STATUS = 0x90
+
+# Meta events
+TEMPO_META = b'\xff\x51\x03'
+END_OF_TRACK = b'\x00\xff\x2f\x00'
+
+# Quarter notes per bar
+QUARTERS_PER_BAR = 4
+
+
+def var_len(value):
+    """ Return variable length quantity used for delta times. """
+    out = bytearray([value & 0x7f])
+    value >>= 7
+    while value:
+        out.insert(0, (value & 0x7f) | 0x80)
+        value >>= 7
+    return bytes(out)
+
+
+def clip(val, vmin=0, vmax=127):
+    """ Return integer value, clipped to a range. """
+    return min(max(int(val), vmin), vmax)
+
+
+class MidiTrack(object):
+
+    """MidiTrack
+
+    Track chunk data that is written to a temporary file while
+    events come in. Only the time of the last event is kept.
+
+    """
+
+    def __init__(self):
+        self.data = tempfile.TemporaryFile(mode='w+b')
+        self.size = 0
+        self.tick = 0
+
+    def write(self, tick, event):
+        """ Write event at absolute tick. Late events play right away. """
+        tick = max(tick, self.tick)
+        chunk = var_len(tick - self.tick) + event
+        self.data.write(chunk)
+        self.size += len(chunk)
+        self.tick = tick
+
+    def copy_to(self, fobj):
+        """ Write track chunk to file object and close temporary file. """
+        fobj.write(b'MTrk' + struct.pack('>I', self.size + len(END_OF_TRACK)))
+        self.data.seek(0)
+        while True:
+            block = self.data.read(65536)
+            if not block:
+                break
+            fobj.write(block)
+        fobj.write(END_OF_TRACK)
+        self.data.close()
+
+
+class MidiFileWriter(object):
+
+    """MidiFileWriter
+
+    Writes notes to a Standard MIDI File (type 1), with a tempo track
+    and one track per midi channel. Note times are in bars. A bar has
+    four quarter notes of "ppq" ticks each, and lasts "cycle" seconds.
+
+    Events are kept in a queue until the song time passes them, then
+    they are streamed to their track. Call "close" to write the file.
+
+    Like the Player, a note that is retriggered (same channel and key)
+    before its offset is turned off at the retrigger, and its own note
+    off is dropped, so it does not cut the new note short.
+
+    """
+
+    def __init__(self, path, ppq=480, cycle=2.0):
+
+        self.path = path
+        self.ppq = ppq
+        self.cycle = Parameter(cycle)
+        self._tracks = {}
+        self._queue = []
+        self._count = 0
+        self._last_tick = 0
+        # Sounding notes: (channel, key) -> (note id, velocity)
+        self._active = {}
+
+    def to_ticks(self, song_time):
+        """ Return midi ticks for song time in bars. """
+        return int(round(song_time * QUARTERS_PER_BAR * self.ppq))
+
+    def _push(self, tick, kind, channel, midi, velocity, note_id):
+        # Note offs (kind 0) go before note ons at the same tick.
+        heapq.heappush(self._queue, (tick, kind, self._count,
+                                     channel, midi, velocity, note_id))
+        self._count += 1
+
+    def add_note(self, note):
+        """ Queue note on and note off events of a note. """
+
+        channel = clip(note.channel, 0, 15)
+        midi = clip(note.midi)
+        velocity = clip(note.velocity)
+        onset = self.to_ticks(note.onset)
+        offset = self.to_ticks(note.onset + note.duration)
+
+        note_id = self._count
+        self._push(onset, 1, channel, midi, velocity, note_id)
+        # A note without duration ends after it starts (kind 2).
+        self._push(offset, 0 if offset > onset else 2,
+                   channel, midi, velocity, note_id)
+
+    def write_notes(self, notes, song_time=None):
+        """ Queue notes, and write events before song_time to tracks. """
+
+        for note in notes:
+            self.add_note(note)
+
+        if song_time is not None:
+            self.flush(self.to_ticks(song_time))
+
+    def flush(self, tick=None):
+        """ Write queued events before tick (or all) to their tracks. """
+
+        while self._queue and (tick is None or self._queue[0][0] < tick):
+            ev_tick, kind, _, channel, midi, velocity, note_id = \
+                heapq.heappop(self._queue)
+            key = (channel, midi)
+
+            if kind == 1:
+                # Retrigger: turn off the sounding note first.
+                if key in self._active:
+                    self._write(ev_tick, NOTE_OFF_STATUS, channel, midi,
+                                self._active[key][1])
+                self._active[key] = (note_id, velocity)
+                self._write(ev_tick, NOTE_ON_STATUS, channel, midi, velocity)
+
+            # Skip the note off of a retriggered note, it was sent.
+            elif self._active.get(key, (None,))[0] == note_id:
+                del self._active[key]
+                self._write(ev_tick, NOTE_OFF_STATUS, channel, midi, velocity)
+
+    def _write(self, tick, status, channel, midi, velocity):
+        if channel not in self._tracks:
+            self._tracks[channel] = MidiTrack()
+        self._tracks[channel].write(tick, struct.pack('BBB', status | channel,
+                                                      midi, velocity))
+        self._last_tick = max(self._last_tick, tick)
+
+    def _tempo_track(self):
+        """ Return tempo track with a tempo event for every bar. """
+
+        track = MidiTrack()
+        ticks_per_bar = QUARTERS_PER_BAR * self.ppq
+        num_bars = self._last_tick // ticks_per_bar + 1
+        prev = None
+        for bar in range(num_bars):
+            cycle = self.cycle.get_value(bar)
+            tempo = int(round(cycle * 1e6 / QUARTERS_PER_BAR))
+            if tempo != prev:
+                track.write(bar * ticks_per_bar,
+                            TEMPO_META + struct.pack('>I', tempo)[1:])
+                prev = tempo
+
+        return track
+
+    def close(self):
+        """ Write remaining events, and the file. """
+
+        self.flush()
+        tracks = [self._tempo_track()]
+        tracks += [self._tracks[chan] for chan in sorted(self._tracks)]
+
+        with open(self.path, 'wb') as fobj:
+            fobj.write(b'MThd' + struct.pack('>IHHH', 6, 1,
+                                             len(tracks), self.ppq))
+            for track in tracks:
+                track.copy_to(fobj)
+
+        self._tracks = {}
+        self._active = {}
+
+
+def write_midi_file(path, patterns, start=0, stop=1,
+                    ppq=480, cycle=2.0, resolution=.02):
+    """ Render patterns from start to stop (in bars) to a midi file. """
+
+    renderer = Renderer(patterns, cycle=cycle, resolution=resolution)
+    writer = MidiFileWriter(path, ppq=ppq, cycle=cycle)
+    for song_time, notes in renderer.iter_ticks(start, stop):
+        writer.write_notes(notes, song_time)
+    writer.close()
+
+    return path
@@ -1,45 +1,206 @@
-from OSC import OSCClient, OSCBundle, ThreadingOSCServer
+from OSC import OSCClient, OSCBundle, OSCEncoder, ThreadingOSCServer
+from engine import AsyncOSCClient, AsyncOSCServer
 from threading import Thread
-from functions import secs2time, print_note
+from functions import secs2time, print_note, note_name
 import sys
 
-class OSC2MidiClient(OSCClient):
+# Typetags of note messages: midi, velocity, channel, spelling, onset
+NOTE_TAGS = 'iiiif'
 
-    """OSC2MidiClient
+# Typetags of note messages with the name instead of the spelling,
+# sent by older clients.
+NAMED_NOTE_TAGS = 'iiisf'
 
-    The OSC2MidiClient sends signals from the main append
-    to an OSC2MidiServer, which may be running on another device.
+
+class MidiMessages(object):
+
+    """MidiMessages
+
+    Sends notes as timestamped bundles. Used by the OSC2Midi
+    clients, which provide the "send" and "sendBinary" methods.
+    Messages are encoded in a reused OSCEncoder buffer.
+
+    In batch mode, notes are collected until "flush" is called
+    (the Player does so after every tick). Then, notes are sent
+    in nested bundles, one per timetag, with as many bundles per
+    datagram as fit in "max_packet" bytes.
 
     """
 
-    def __init__(self, host='127.0.0.1',
-                 port=2222,
-                 latency=2.0):
-        OSCClient.__init__(self)
-        self.connect((host, port))
+    # Largest batched datagram; the UDP payload of an ethernet MTU.
+    max_packet = 1472
+
+    def init_messages(self, latency=2.0, batch=False):
+        """Set latency and batch mode."""
         self.latency = latency
+        self.batch = batch
+        self._pending = {}
+        self._encoder = OSCEncoder()
+
+    def send_note(self, address, args, onset):
+        """Send or collect note message at onset plus latency."""
+        timetag = onset + self.latency
+        if self.batch:
+            self._pending.setdefault(timetag, []).append((address, args))
+        else:
+            enc = self._encoder
+            enc.reset()
+            enc.beginBundle(timetag)
+            enc.addMessage(address, args, NOTE_TAGS)
+            enc.endBundle()
+            self.sendBinary(enc.getView())
+
     def note_on(self, note, onset):
         """Send note on message through timestamped bundle."""
-        bundle = OSCBundle(address='/midi/noteon', time=onset+self.latency)
-        #print 'ON:', onset+self.latency
-        bundle.append(note.on_msg())
-        self.send(bundle)
+        self.send_note('/midi/noteon', note.on_msg(), onset)
 
     def note_off(self, note, onset):
         """Send note off message through timestamped bundle."""
-        bundle = OSCBundle(address='/midi/noteoff', time=onset+self.latency)
-        #print 'OFF:', onset+self.latency
-        bundle.append(note.off_msg())
-        self.send(bundle)
+        self.send_note('/midi/noteoff', note.off_msg(), onset)
+
+    def flush(self):
+        """Send collected notes, grouped by timetag."""
+        if not self._pending:
+            return
+
+        enc = self._encoder
+        enc.reset()
+        enc.beginBundle()
+        num_msgs = 0
+        for timetag in sorted(self._pending):
+            bundle_start = enc.size
+            enc.beginBundle(timetag)
+            num_bundle_msgs = 0
+            for address, args in self._pending[timetag]:
+                msg_start = enc.size
+                enc.addMessage(address, args, NOTE_TAGS)
+
+                # Packet is full; send it without this message,
+                # and continue in a new packet.
+                if enc.size > self.max_packet and num_msgs:
+                    enc.truncate(bundle_start if not num_bundle_msgs
+                                 else msg_start)
+                    enc.endAllBundles()
+                    self.sendBinary(enc.getView())
+
+                    enc.reset()
+                    enc.beginBundle()
+                    enc.beginBundle(timetag)
+                    enc.addMessage(address, args, NOTE_TAGS)
+                    num_msgs = num_bundle_msgs = 0
+
+                num_msgs += 1
+                num_bundle_msgs += 1
+
+            enc.endBundle()
+
+        enc.endBundle()
+        self.sendBinary(enc.getView())
+        self._pending = {}
 
     def stop(self):
         """Send stop message through timestamped bundle."""
+        self.flush()
         bundle = OSCBundle(address='/stop', time=0)
         bundle.append('stopping...')
         self.send(bundle)
 
 
-class OSC2MidiServer(Thread, ThreadingOSCServer):
+class OSC2MidiClient(MidiMessages, OSCClient):
+
+    """OSC2MidiClient
+
+    The OSC2MidiClient sends signals from the main append
+    to an OSC2MidiServer, which may be running on another device.
+
+    """
+
+    def __init__(self, host='127.0.0.1',
+                 port=2222,
+                 latency=2.0,
+                 batch=False):
+        OSCClient.__init__(self)
+        self.connect((host, port))
+        self.init_messages(latency, batch)
+
+
+class AsyncOSC2MidiClient(MidiMessages, AsyncOSCClient):
+
+    """AsyncOSC2MidiClient
+
+    OSC2MidiClient that sends from an EventLoop.
+
+    """
+
+    def __init__(self, loop,
+                 host='127.0.0.1',
+                 port=2222,
+                 latency=2.0,
+                 batch=False):
+        AsyncOSCClient.__init__(self, loop, (host, port))
+        self.init_messages(latency, batch)
+
+
+class MidiHandlers(object):
+
+    """MidiHandlers
+
+    OSC message handlers that play notes on a midi device. Used
+    by the OSC2Midi servers.
+
+    """
+
+    def init_midi(self, _midi, dev_id):
+        """Initialize midi and open output device."""
+        self.midi = _midi
+        self.midi.init()
+        self.start_time = self.midi.time()
+
+        self.midi_out = self.midi.Output(dev_id)
+
+    def unpack_note(self, tags, stuff):
+        """Return midi, velocity, channel and name of a note message."""
+        if tags == NOTE_TAGS:
+            return stuff[0], stuff[1], stuff[2], note_name(stuff[0], stuff[3])
+
+        if tags == NAMED_NOTE_TAGS:
+            return stuff[0], stuff[1], stuff[2], stuff[3]
+
+        # Underscore joined string, sent by older clients.
+        midi, velocity, channel, name, onset = stuff[0].split('_')
+        return int(midi), int(velocity), int(channel), name
+
+    def note_on(self, addr, tags, stuff, src):
+        """Send note on signal to midi stream."""
+        # Unpack information
+        midi, velocity, channel, name = self.unpack_note(tags, stuff)
+        elapsed = (self.midi.time() - self.start_time) / 1000.0
+        print_note(secs2time(elapsed),
+                   name, str(velocity), 'ON',
+                   channel)
+        # Turn on midi note.
+        self.midi_out.note_on(midi, velocity, channel)
+
+    def note_off(self, addr, tags, stuff, src):
+        """Send note off signal to midi stream."""
+        # Unpack information
+        midi, velocity, channel, name = self.unpack_note(tags, stuff)
+        elapsed = (self.midi.time() - self.start_time) / 1000.0
+        print_note(secs2time(elapsed),
+                   name, str(velocity), 'OFF',
+                   channel)
+        
+        # Turn off midi note.
+        self.midi_out.note_off(midi, velocity, channel)
+
+    def all_notes_off(self):
+        """Stop all playing notes."""
+        for chan in range(16):
+            for note in range(128):
+                self.midi_out.note_off(note, 0, chan)
+
+
+class OSC2MidiServer(MidiHandlers, Thread, ThreadingOSCServer):
 
     """OSC2MidiServer
 
@@ -56,11 +217,7 @@ class OSC2MidiServer(Thread, ThreadingOSCServer):
                  **kwargs):
 
         # Initialize midi
-        self.midi = _midi
-        self.midi.init()
-        self.start_time = self.midi.time()
-        
-        self.midi_out = self.midi.Output(dev_id)
+        self.init_midi(_midi, dev_id)
 
         # OSC server stuff
         ThreadingOSCServer.__init__(self, (address, port))
@@ -76,29 +233,6 @@ class OSC2MidiServer(Thread, ThreadingOSCServer):
         print "\nStarting OSCServer. Use ctrl-C to quit."
         super(OSC2MidiServer, self).__init__(target=self.serve_forever)
 
-    def note_on(self, addr, tags, stuff, src):
-        """Send note on signal to midi stream."""
-        # Unpack information
-        midi, velocity, channel, name, onset = stuff[0].split('_')
-        elapsed = (self.midi.time() - self.start_time) / 1000.0
-        print_note(secs2time(elapsed),
-                   name, velocity, 'ON',
-                   channel)
-        # Turn on midi note.
-        self.midi_out.note_on(int(midi), int(velocity), int(channel))
-
-    def note_off(self, addr, tags, stuff, src):
-        """Send note off signal to midi stream."""
-        # Unpack information
-        midi, velocity, channel, name, onset = stuff[0].split('_')
-        elapsed = (self.midi.time() - self.start_time) / 1000.0
-        print_note(secs2time(elapsed),
-                   name, velocity, 'OFF',
-                   channel)
-        
-        # Turn off midi note.
-        self.midi_out.note_off(int(midi), int(velocity), int(channel))
-
     def stop(self, addr, tags, stuff, src):
         """Stop midi and terminate the server."""
 
@@ -106,9 +240,7 @@ class OSC2MidiServer(Thread, ThreadingOSCServer):
         print 'Closing midi device...'
 
         # Stop all playing notes.
-        for chan in range(16):
-            for note in range(128):
-                self.midi_out.note_off(note, 0, chan)
+        self.all_notes_off()
 
         # Close things.
         print 'Closing connection...'
@@ -117,6 +249,40 @@ class OSC2MidiServer(Thread, ThreadingOSCServer):
         self.join()
         print 'Done.'
 
+
+class AsyncOSC2MidiServer(MidiHandlers, AsyncOSCServer):
+
+    """AsyncOSC2MidiServer
+
+    OSC2MidiServer that runs on an EventLoop. Timestamped notes
+    are scheduled on the loop, instead of held in threads.
+
+    """
+
+    def __init__(self, loop,
+                 address='127.0.0.1',
+                 port=2222,
+                 dev_id=3,
+                 _midi=None):
+
+        # Initialize midi
+        self.init_midi(_midi, dev_id)
+
+        # OSC server stuff
+        AsyncOSCServer.__init__(self, loop, (address, port))
+        self.addMsgHandler("/midi/noteon", self.note_on)
+        self.addMsgHandler("/midi/noteoff", self.note_off)
+        self.addMsgHandler("/stop", self.stop)
+
+    def stop(self, addr, tags, stuff, src):
+        """Stop midi and close the server."""
+
+        print 'Closing midi device...'
+        self.all_notes_off()
+        print 'Closing connection...'
+        self.close()
+        print 'Done.'
+
 class OutputPrint():
 
     """Used for debugging.
@@ -137,3 +303,7 @@ class OutputPrint():
         print real_offset
         print note.to_string()
         print '---'
+
+    def flush(self):
+        """Nothing to flush."""
+        pass
@@ -0,0 +1,98 @@
+from base import Parameter
+from math import floor
+import numpy as np
+
+# Fields of a rendered note event. Times are in seconds from bar 0.
+EVENT_DTYPE = np.dtype([('onset', 'f8'),
+                        ('offset', 'f8'),
+                        ('midi', 'i2'),
+                        ('velocity', 'i2'),
+                        ('channel', 'i2')])
+
+
+class Renderer(object):
+
+    """Renderer
+
+    Offline counterpart of the Player. The patterns are walked over
+    a range of song time in steps of "resolution" bars, without
+    waiting for a clock, so a song renders as fast as it computes.
+    Steps lie on a grid from bar 0 and on every barline, so the
+    notes do not depend on where a render starts. Like the tick of
+    the Player, the resolution sets how often animated rhythm
+    parameters are sampled. The cycle parameter gives the duration
+    of a bar in seconds and is evaluated at the start of each bar.
+
+    """
+
+    def __init__(self, patterns, cycle=2.0, resolution=.02):
+
+        self.patterns = patterns
+        self.cycle = Parameter(cycle)
+        self.resolution = resolution
+        self._bar_onsets = [0.0]
+
+    def bar_onset(self, bar):
+        """ Return onset of bar in seconds. """
+
+        if bar < 0:
+            raise ValueError("bar must not be negative, got %s" % bar)
+
+        while len(self._bar_onsets) <= bar:
+            prev = len(self._bar_onsets) - 1
+            self._bar_onsets.append(self._bar_onsets[prev] +
+                                    self.cycle.get_value(prev))
+
+        return self._bar_onsets[bar]
+
+    def real_time(self, song_time):
+        """ Return time in seconds of a song time in bars. """
+
+        bar = int(floor(song_time))
+        cycle = self.cycle.get_value(bar)
+        return self.bar_onset(bar) + (song_time - bar) * cycle
+
+    def iter_ticks(self, start=0, stop=1):
+        """ Yield song time and notes of all patterns for every step. """
+
+        for pat in self.patterns:
+            pat.reset(start)
+
+        # Steps are on a grid from bar 0, so a range gives the notes
+        # of the same range in a longer render. Every barline is a
+        # step as well, so no step crosses one.
+        first = int(floor(start / self.resolution)) + 1
+        last = int(np.ceil(stop / self.resolution))
+        ticks = [i * self.resolution for i in range(first, last)]
+        ticks += [float(bar) for bar in range(int(floor(start)) + 1,
+                                              int(np.ceil(stop)))]
+        ticks = [tick for tick in ticks if start < tick < stop] + [stop]
+
+        for song_time in sorted(set(ticks)):
+            notes = []
+            for pat in self.patterns:
+                notes += pat.get_notes(song_time)
+            yield song_time, notes
+
+    def iter_notes(self, start=0, stop=1):
+        """ Yield notes of all patterns from start to stop (in bars). """
+
+        for song_time, notes in self.iter_ticks(start, stop):
+            for note in notes:
+                yield note
+
+    def render(self, start=0, stop=1):
+        """ Return structured array of note events, ordered by onset. """
+
+        events = []
+        for note in self.iter_notes(start, stop):
+            onset = self.real_time(note.onset)
+            cycle = self.cycle.get_value(floor(note.onset))
+            offset = onset + note.duration * cycle
+            events.append((onset, offset, int(note.midi),
+                           int(note.velocity), int(note.channel)))
+
+        events = np.array(events, dtype=EVENT_DTYPE)
+        events.sort(order='onset', kind='mergesort')
+
+        return events
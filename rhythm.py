@@ -1,5 +1,5 @@
 from base import Parameter
-from functions import euclidean_rhythm
+from functions import cached_euclidean_rhythm
 from math import floor
 
 
@@ -43,36 +43,47 @@ class Rhythm(object):
         bar_length = self.bar_length.get_value(start)
         bar_shift = self.bar_shift.get_value(start)
         
-        _, onsets = euclidean_rhythm(steps, pulses, shift,
-                                     length=bar_length,
-                                     onset=True)
+        _, onsets = cached_euclidean_rhythm(steps, pulses, shift,
+                                            length=bar_length)
         
         # shift start and stop to select onsets
         _start = (start + bar_shift) % bar_length
         _stop = (stop + bar_shift) % bar_length
-        if _start > _stop:
-            _start -= bar_length
 
-        onsets = [on for on in onsets if (on >= _start) and (on < _stop)]
-                
         # reshift
         bar = floor(start)
         _bar = floor(_start)
-        onsets = [on-_bar+bar for on in onsets]
+        if _start <= _stop:
+            onsets = [on-_bar+bar for on in onsets
+                      if (on >= _start) and (on < _stop)]
+        else:
+            # The segment wraps past the end of the bar: take the
+            # onsets before the barline, and those after it.
+            next_bar = floor(stop)
+            _next_bar = floor(_stop)
+            onsets = ([on-_bar+bar for on in onsets if on >= _start] +
+                      [on-_next_bar+next_bar for on in onsets if on < _stop])
+            _start -= bar_length
 
         # Go through onsets and make strike,
         # or arpeggio, or chord.
+        nums = self.num_notes.get_values(onsets).astype(int)
+        indices = self.index.get_values(onsets).astype(int)
+        skip_steps = self.skip_step.get_values(onsets)
+        skip_notes = self.skip_note.get_values(onsets).astype(int)
+
         out_on = []
         out_ind = []
         for i, on in enumerate(onsets):
-            num = int(self.num_notes.get_value(on))
-            index = int(self.index.get_value(on))
-            skip_step = self.skip_step.get_value(on)
+            num = int(nums[i])
+            index = int(indices[i])
+            skip_step = float(skip_steps[i])
             ss = bar_length / steps * skip_step
-            sn = int(self.skip_note.get_value(on))+1
+            sn = int(skip_notes[i])+1
 
             for n in range(num):
-                out_on += [on+n*ss for on in onsets if (on+n*ss) >= _start]
-                out_ind += [index+n*sn for on in onsets if (on+n*ss) >= _start]
+                if (on+n*ss) >= _start:
+                    out_on.append(on+n*ss)
+                    out_ind.append(index+n*sn)
 
         return out_on, out_ind
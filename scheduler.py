@@ -0,0 +1,188 @@
+from collections import OrderedDict
+import heapq
+
+
+class NoteScheduler(object):
+
+    """NoteScheduler
+
+    Keeps the notes that are playing, ordered by their real offset
+    time in a heap. A dictionary indexes the playing notes by channel
+    and midi number, so checking for a retrigger is a lookup. Replaced
+    notes stay in the heap, but are skipped when they come up.
+
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._active = {}
+        self._count = 0
+
+    def __len__(self):
+        return len(self._active)
+
+    def __contains__(self, note):
+        return (note.channel, note.midi) in self._active
+
+    def __iter__(self):
+        return iter([entry[2] for entry in self._active.values()])
+
+    def add(self, note, real_offset):
+        """ Add note. Returns the note it replaces, or None. """
+
+        key = (note.channel, note.midi)
+        prev = self._active.pop(key, None)
+        prev_note = None
+        if prev is not None:
+            # Invalidate, so the previous note is not turned off.
+            prev_note = prev[2]
+            prev[2] = None
+
+        entry = [real_offset, self._count, note, key]
+        self._count += 1
+        self._active[key] = entry
+        heapq.heappush(self._heap, entry)
+
+        return prev_note
+
+    def remove(self, note):
+        """ Remove note with same channel and midi, if playing. """
+
+        entry = self._active.pop((note.channel, note.midi), None)
+        if entry is not None:
+            entry[2] = None
+
+    def _discard_removed(self):
+        while self._heap and self._heap[0][2] is None:
+            heapq.heappop(self._heap)
+
+    def next_offset(self):
+        """ Return earliest real offset time, or None. """
+
+        self._discard_removed()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now):
+        """ Remove and return (note, real_offset) of notes ending before now. """
+
+        out = []
+        self._discard_removed()
+        while self._heap and self._heap[0][0] < now:
+            real_offset, _, note, key = heapq.heappop(self._heap)
+            del self._active[key]
+            out.append((note, real_offset))
+            self._discard_removed()
+
+        return out
+
+    def clear(self):
+        """ Remove all notes. """
+
+        self._heap = []
+        self._active = {}
+        self._count = 0
+
+
+class VoiceTracker(NoteScheduler):
+
+    """VoiceTracker
+
+    NoteScheduler that allocates voices. At most "polyphony" notes
+    play at once per channel; a dictionary of channel to polyphony
+    sets limits per channel, and None means no limit. When a channel
+    is full, the oldest or the quietest of its notes ("steal") is
+    turned off to make room. A retriggered note (same channel and
+    midi number) takes over the voice of the note that is playing.
+    The real onset of each voice is kept, so a note is never turned
+    off before it started.
+
+    """
+
+    steal_modes = ('oldest', 'quietest')
+
+    def __init__(self, polyphony=None, steal='oldest'):
+        if steal not in self.steal_modes:
+            raise ValueError("steal must be one of %s" % (self.steal_modes,))
+
+        limits = polyphony.values() if isinstance(polyphony, dict) else [polyphony]
+        if any(limit is not None and limit < 1 for limit in limits):
+            raise ValueError("polyphony must be at least 1")
+
+        NoteScheduler.__init__(self)
+        self.polyphony = polyphony
+        self.steal = steal
+        # Playing notes per channel, oldest first
+        self._voices = {}
+        # Real onset of each playing note
+        self._onsets = {}
+
+    def limit(self, channel):
+        """ Return polyphony of channel, or None. """
+
+        if isinstance(self.polyphony, dict):
+            return self.polyphony.get(channel)
+        return self.polyphony
+
+    def start(self, note, real_onset, real_offset):
+        """ Add note. Returns (note, real_onset) of the notes to turn
+        off before it is played: the note it retriggers, or the notes
+        whose voices are stolen. """
+
+        key = (note.channel, note.midi)
+        off = []
+
+        # A retrigger reuses its voice; only new voices are limited.
+        if key not in self._active:
+            limit = self.limit(note.channel)
+            voices = self._voices.get(note.channel)
+            while limit is not None and voices and len(voices) >= limit:
+                stolen = self._choose_stolen(voices)
+                off.append((stolen, self._onsets[(stolen.channel, stolen.midi)]))
+                self.remove(stolen)
+
+        prev_onset = self._onsets.get(key)
+        prev = self.add(note, real_offset)
+        if prev is not None:
+            off.append((prev, prev_onset))
+        self._onsets[key] = real_onset
+
+        return off
+
+    def _choose_stolen(self, voices):
+        if self.steal == 'oldest':
+            return voices.itervalues().next()[2]
+        return min(voices.itervalues(), key=lambda entry: entry[2].velocity)[2]
+
+    def add(self, note, real_offset):
+        prev = NoteScheduler.add(self, note, real_offset)
+
+        key = (note.channel, note.midi)
+        voices = self._voices.setdefault(note.channel, OrderedDict())
+        voices.pop(key, None)
+        voices[key] = self._active[key]
+
+        return prev
+
+    def remove(self, note):
+        NoteScheduler.remove(self, note)
+        self._release((note.channel, note.midi))
+
+    def pop_due(self, now):
+        out = NoteScheduler.pop_due(self, now)
+        for note, _ in out:
+            self._release((note.channel, note.midi))
+
+        return out
+
+    def _release(self, key):
+        voices = self._voices.get(key[0])
+        if voices is not None:
+            voices.pop(key, None)
+            if not voices:
+                del self._voices[key[0]]
+        self._onsets.pop(key, None)
+
+    def clear(self):
+        NoteScheduler.clear(self)
+        self._voices = {}
+        self._onsets = {}